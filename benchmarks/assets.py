@@ -0,0 +1,94 @@
+"""Web UI asset loading benchmark: loose files versus the webui_build bundle.
+
+Run from the repository root: python -m benchmarks.assets [rounds]
+Needs the Web UI vendor files (run `main.py webui` once). Works on a copy
+of data/, fetching what the manager loads at startup over localhost:
+one request per file with no compression, then the bundle as pywebview
+serves it without --serve, then with gzip, then again with every
+immutable file already cached. Exits non-zero if any file is missing."""
+
+import re
+import shutil
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Thread
+
+from webapps.webui.assets import AssetServer
+from webapps.webui.bundle import DIST, build
+
+from .common import ROOT, summarize
+
+VENDOR = re.compile(r'"(vendor/[^"]+)"')
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """Plain static files, as the loose data/ directory would be served"""
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+def fetch(base: str, paths: list[str], encoding: str = "") -> int:
+    """GET every path, return the bytes transferred. Exits on any missing file"""
+    transferred = 0
+    for path in paths:
+        request = urllib.request.Request(base + path, headers={"Accept-Encoding": encoding})
+        try:
+            with urllib.request.urlopen(request) as response:
+                transferred += len(response.read())
+        except urllib.error.HTTPError as error:
+            sys.exit(f"{base}{path}: {error.code} {error.reason}")
+    return transferred
+
+
+def measure(label: str, base: str, paths: list[str], rounds: int, encoding: str = ""):
+    """Fetch paths rounds times and print the timing, requests and bytes"""
+    samples = []
+    for _ in range(rounds):
+        begin = time.perf_counter()
+        transferred = fetch(base, paths, encoding)
+        samples.append(time.perf_counter() - begin)
+    summarize(label, samples)
+    print(" " * 18 + f"{len(paths)} requests, {transferred / 1024:.1f}KiB")
+
+
+def main(rounds: int = 20):
+    """Benchmark entry"""
+    with tempfile.TemporaryDirectory() as temp:
+        root = Path(temp) / "data"
+        shutil.copytree(ROOT / "data", root, ignore=shutil.ignore_patterns(DIST))
+        try:
+            manifest = build(root)
+        except FileNotFoundError as error:
+            sys.exit(str(error))
+        vendor = VENDOR.findall((root / manifest["entry"]).read_text(encoding="utf-8"))
+        sources = [source for source in manifest["files"] if source != "preload.js"]
+        loose = ["main.html", *vendor, *sources, *manifest["templates"]]
+        bundled = [manifest["entry"], *vendor]
+        bundled += [f"{DIST}/{output}" for output in manifest["files"].values()]
+
+        # Rooted at the directory of the page, as pywebview serves a file path
+        page = (root / manifest["entry"]).parent
+        server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=page))
+        Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address[:2]
+        measure("loose", f"http://{host}:{port}/", loose, rounds)
+        measure("bundle, file", f"http://{host}:{port}/", bundled, rounds)
+        server.shutdown()
+
+        assets = AssetServer(root).start()
+        base = assets.url("")
+        measure("bundle", base, bundled, rounds, "gzip")
+        # Hashed files are cached for good; only the page and vendor files are fetched again
+        measure("bundle, cached", base, bundled[: 1 + len(vendor)], rounds, "gzip")
+        assets.stop()
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
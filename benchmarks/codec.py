@@ -0,0 +1,151 @@
+"""Profile load/save throughput: compiled codecs against the old heuristic path.
+
+Run from the repository root: python -m benchmarks.codec [rounds]
+The legacy functions below are the _dump/_dset pair the codecs replaced,
+kept here as the reference point."""
+
+import sys
+import time
+from configparser import ConfigParser
+from io import StringIO
+
+from webapps.profiles import (
+    _DELOBJS_CW,
+    _DELOBJS_S,
+    _STR_DEFKEY,
+    CW_CODEC,
+    SETTING_CODEC,
+    START_CODEC,
+    CWConfig,
+    Profile,
+    StartConfig,
+    WebviewSetting,
+    annihilate_defconst,
+    replace_default,
+)
+
+
+def legacy_dset(profile: ConfigParser, section: str, ns: dict):
+    """Old encoder"""
+    for k, v in ns.items():
+        if v in (None, False):
+            profile.set(section, k, "no")
+            continue
+        if v is True:
+            profile.set(section, k, "yes")
+            continue
+        profile.set(section, k, str(v))
+
+
+def legacy_dump(profile: ConfigParser, section: str):
+    """Old decoder"""
+    data = {}
+    for k, v in profile[section].items():
+        if v in ("no", "false", "0"):
+            data[k] = False
+            continue
+        if v in ("yes", "true", "1"):
+            data[k] = True
+            continue
+        if v.isnumeric():
+            data[k] = int(v)
+            continue
+        if v == _STR_DEFKEY:
+            continue
+        data[k] = v
+    return data
+
+
+def legacy_save(profile: Profile, parser: ConfigParser):
+    """Old save, minus the file writes"""
+    name = "bench"
+    parsed_data = profile.data._asdict()
+    parsed_sdata = profile.start_data._asdict()
+    for i in _DELOBJS_CW:
+        del parsed_data[i]
+    for i in _DELOBJS_S:
+        del parsed_sdata[i]
+    if not parser.has_section(name):
+        parser.add_section(name)
+        parser.add_section(f"{name}.start")
+        parser.add_section(f"{name}.common")
+    legacy_dset(parser, name, replace_default(parsed_data, _STR_DEFKEY))
+    legacy_dset(parser, f"{name}.start", replace_default(parsed_sdata, _STR_DEFKEY))
+    legacy_dset(
+        parser, f"{name}.common", replace_default(profile.common_config._asdict(), _STR_DEFKEY)
+    )
+    sio = StringIO()
+    parser.write(sio)
+    return sio.getvalue()
+
+
+def legacy_load(parser: ConfigParser):
+    """Old load and to_dict, minus the file read"""
+    name = "bench"
+    data = CWConfig(**legacy_dump(parser, name))
+    start = StartConfig(**legacy_dump(parser, f"{name}.start"))
+    common = WebviewSetting(
+        **{key.upper(): value for key, value in legacy_dump(parser, f"{name}.common").items()}
+    )
+    return (
+        annihilate_defconst(data._asdict(), True),
+        annihilate_defconst(start._asdict(), True),
+        annihilate_defconst(common._asdict(), True),
+    )
+
+
+def codec_save(profile: Profile, parser: ConfigParser):
+    """New save, minus the file writes"""
+    name = "bench"
+    parser.read_dict(
+        {
+            name: CW_CODEC.encode(profile.data),
+            f"{name}.start": START_CODEC.encode(profile.start_data),
+            f"{name}.common": SETTING_CODEC.encode(profile.common_config),
+        }
+    )
+    sio = StringIO()
+    parser.write(sio)
+    return sio.getvalue()
+
+
+def codec_load(parser: ConfigParser):
+    """New load and to_dict, minus the file read"""
+    name = "bench"
+    data = CW_CODEC.decode(parser.items(name, raw=True))
+    start = START_CODEC.decode(parser.items(f"{name}.start", raw=True))
+    common = SETTING_CODEC.decode(parser.items(f"{name}.common", raw=True))
+    return (
+        CW_CODEC.to_dict(data, True),
+        START_CODEC.to_dict(start, True),
+        SETTING_CODEC.to_dict(common, True),
+    )
+
+
+def rate(label: str, function, rounds: int):
+    """Print and return calls per second"""
+    begin = time.perf_counter()
+    for _ in range(rounds):
+        function()
+    per_second = rounds / (time.perf_counter() - begin)
+    print(f"{label:>16}: {per_second:10.0f}/s")
+    return per_second
+
+
+def main(rounds: int = 5000):
+    """Benchmark entry"""
+    profile = Profile("bench", "https://example.com", "Bench")
+    text = codec_save(profile, ConfigParser(interpolation=None))
+    parser = ConfigParser(interpolation=None)
+    parser.read_string(text)
+
+    old = rate("legacy load", lambda: legacy_load(parser), rounds)
+    new = rate("codec load", lambda: codec_load(parser), rounds)
+    print(f"{'speedup':>16}: {new / old:.1f}x")
+    old = rate("legacy save", lambda: legacy_save(profile, ConfigParser(interpolation=None)), rounds)
+    new = rate("codec save", lambda: codec_save(profile, ConfigParser(interpolation=None)), rounds)
+    print(f"{'speedup':>16}: {new / old:.1f}x")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
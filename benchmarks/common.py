@@ -0,0 +1,26 @@
+"""Benchmark helpers"""
+
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from statistics import median, quantiles
+
+ROOT = Path(__file__).parent.parent
+MAIN = ROOT / "main.py"
+COMMAND = [sys.executable, str(MAIN)]
+
+
+@contextmanager
+def temp_home():
+    """Throwaway HOME (and so CONFIG_DIR), yields the environment to run main.py in"""
+    with tempfile.TemporaryDirectory() as home:
+        yield {**os.environ, "HOME": home}
+
+
+def summarize(label: str, samples: list[float]):
+    """Print median and p95 of samples, in milliseconds"""
+    p95 = quantiles(samples, n=20)[-1] if len(samples) > 1 else samples[0]
+    print(f"{label:>16}: median {median(samples) * 1000:8.1f}ms  p95 {p95 * 1000:8.1f}ms")
+    return median(samples)
@@ -0,0 +1,74 @@
+"""Concurrency stress test of the config store.
+
+Run from the repository root: python -m benchmarks.config_store [seconds] [readers] [writers]
+Readers and writers hammer one ConfigAPI (read cache disabled, so every
+read hits SQLite) from their own threads. Exits non-zero on any error,
+such as 'database is locked'."""
+
+import os
+import sys
+import time
+from threading import Event, Thread
+
+from .common import ROOT, temp_home
+
+
+def main(seconds: float = 3, readers: int = 8, writers: int = 4):
+    """Benchmark entry"""
+    with temp_home() as env:
+        sys.path.insert(0, str(ROOT))
+        os.environ["HOME"] = env["HOME"]
+        # pylint: disable=import-outside-toplevel
+        from webapps.webui.config_api import ConfigAPI
+
+        store = ConfigAPI(cache_size=0)
+        keys = [f"key{i}" for i in range(64)]
+        store.set_many({key: {"value": 0} for key in keys})
+        stop = Event()
+        counts = {"get": 0, "get_many": 0, "set": 0, "set_many": 0}
+        errors: list[BaseException] = []
+
+        def reader(index: int):
+            done = 0
+            try:
+                while not stop.is_set():
+                    store.get(keys[(index + done) % len(keys)])
+                    done += 1
+                    if done % 16 == 0:
+                        store.get_many(keys[:16])
+                        counts["get_many"] += 1
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                errors.append(exc)
+            counts["get"] += done
+
+        def writer(index: int):
+            done = 0
+            try:
+                while not stop.is_set():
+                    store.set(keys[(index * 7 + done) % len(keys)], {"value": done})
+                    done += 1
+                    if done % 16 == 0:
+                        store.set_many({key: {"value": done} for key in keys[:8]})
+                        counts["set_many"] += 1
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                errors.append(exc)
+            counts["set"] += done
+
+        threads = [Thread(target=reader, args=(i,)) for i in range(readers)]
+        threads += [Thread(target=writer, args=(i,)) for i in range(writers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    for name, count in counts.items():
+        print(f"{name:>16}: {count / seconds:10.0f} ops/s")
+    for error in errors[:5]:
+        print(f"{'ERROR':>16}: {error!r}")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main(*map(float, sys.argv[1:2]), *map(int, sys.argv[2:]))
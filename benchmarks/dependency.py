@@ -0,0 +1,179 @@
+"""Web UI dependency download against a local stand-in server: resume and parallelism.
+
+Run from the repository root: python -m benchmarks.dependency [packages] [MiB]
+Serves pinned artifacts (zips, plus one .js) from localhost, throttled
+so downloads overlap. The first request of each artifact is cut off
+halfway; the install must fail, then resume every artifact with a Range
+request from where it stopped and finish with the pinned hash. One more,
+unpinned artifact changes on the server in between: it must be
+downloaded again from the start, not spliced. Exits non-zero if any of
+this fails, or if no two downloads ran at the same time."""
+
+import io
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from hashlib import sha256
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Lock, Thread
+
+import requests
+
+from webapps.webui.dependency import (
+    ArtifactCache,
+    Package,
+    hash_file,
+    install_webui_dependency,
+    load_manifest,
+)
+
+CHUNK = 65536
+# Seconds per chunk sent, so downloads take long enough to overlap
+THROTTLE = 0.002
+
+
+def cut_at(data: bytes) -> int:
+    """Where the first response of data stops: halfway, on a chunk boundary.
+
+    A read cut short is dropped by the client, so only whole chunks arrive"""
+    return len(data) // 2 // CHUNK * CHUNK
+
+
+class StandIn(ThreadingHTTPServer):
+    """Artifacts by path, cutting the first response of each off halfway"""
+
+    def __init__(self, artifacts: dict[str, bytes]) -> None:
+        super().__init__(("127.0.0.1", 0), RangeHandler)
+        self.artifacts = artifacts
+        self.cut: set[str] = set()
+        self.ranges: list[tuple[str, int]] = []
+        self.active = 0
+        self.most_active = 0
+        self.lock = Lock()
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """GET with single "bytes=N-" ranges, honoured while If-Range matches the ETag"""
+
+    server: StandIn
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Serve an artifact, or the rest of it"""
+        data = self.server.artifacts.get(self.path)
+        if data is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        offset = 0
+        etag = f'"{sha256(data).hexdigest()}"'
+        requested = self.headers.get("Range", "")
+        if requested.startswith("bytes=") and self.headers.get("If-Range", etag) == etag:
+            offset = int(requested[6:].split("-")[0])
+            with self.server.lock:
+                self.server.ranges.append((self.path, offset))
+            if offset >= len(data):
+                self.send_error(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                return
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header("Content-Range", f"bytes {offset}-{len(data) - 1}/{len(data)}")
+        else:
+            self.send_response(HTTPStatus.OK)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(data) - offset))
+        self.end_headers()
+        with self.server.lock:
+            cut = self.path not in self.server.cut
+            self.server.cut.add(self.path)
+            self.server.active += 1
+            self.server.most_active = max(self.server.most_active, self.server.active)
+        end = cut_at(data) if cut else len(data)
+        try:
+            for start in range(offset, end, CHUNK):
+                self.wfile.write(data[start : min(start + CHUNK, end)])
+                time.sleep(THROTTLE)
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+        if cut:
+            # Drop the connection with about half of the promised bytes sent
+            self.close_connection = True
+            self.wfile.flush()
+            self.connection.shutdown(2)
+
+
+def artifact(index: int, size: int) -> tuple[str, bytes]:
+    """A zip holding size random bytes, or a plain .js for the first one"""
+    payload = os.urandom(size)
+    if index == 0:
+        return "/package0.js", payload
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as zip_file:
+        zip_file.writestr(f"package{index}/blob.bin", payload)
+    return f"/package{index}.zip", buffer.getvalue()
+
+
+def main(count: int = 4, mebibytes: int = 2):
+    """Benchmark entry"""
+    artifacts = dict(artifact(index, mebibytes << 20) for index in range(count))
+    server = StandIn(dict(artifacts))
+    Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    packages = tuple(
+        Package(f"package{index}", f"http://{host}:{port}{path}", "1", sha256(data).hexdigest())
+        for index, (path, data) in enumerate(artifacts.items())
+    )
+    changing, server.artifacts[changing] = artifact(count, mebibytes << 20)
+    unpinned = Package("unpinned", f"http://{host}:{port}{changing}", "snapshot")
+    failed = []
+    with tempfile.TemporaryDirectory() as temp:
+        vendor_dir = Path(temp) / "vendor"
+        cache = ArtifactCache(Path(temp) / "cache")
+        try:
+            install_webui_dependency(
+                packages=(*packages, unpinned), vendor_dir=vendor_dir, cache=cache
+            )
+            failed.append("the install went through although every download was cut off")
+        except requests.RequestException as error:
+            print(f"{'interrupted':>16}: {type(error).__name__}")
+        # A new snapshot is published while the download is interrupted
+        changed = server.artifacts[changing] = artifact(count, mebibytes << 20)[1]
+        begin = time.perf_counter()
+        install_webui_dependency(
+            packages=(*packages, unpinned), vendor_dir=vendor_dir, cache=cache
+        )
+        elapsed = time.perf_counter() - begin
+        installed = load_manifest(vendor_dir)
+        if installed.get(unpinned.name, {}).get("sha256") != sha256(changed).hexdigest():
+            failed.append("the changed unpinned artifact was spliced or not installed")
+        if any(path == changing for path, _ in server.ranges):
+            failed.append("the changed unpinned artifact was resumed")
+        halves = {path: cut_at(data) for path, data in artifacts.items()}
+        for package, path in zip(packages, artifacts):
+            entry = installed.get(package.name)
+            if entry is None or entry["sha256"] != package.sha256:
+                failed.append(f"{package.name} not installed with its pinned hash")
+            elif hash_file(cache.lookup(package.url, package.sha256)) != package.sha256:
+                failed.append(f"{package.name} cached with another hash")
+            if (path, halves[path]) not in server.ranges:
+                failed.append(f"{package.name} not resumed from byte {halves[path]}")
+    server.shutdown()
+
+    total = sum(len(data) for data in artifacts.values())
+    print(f"{'resumed':>16}: {len(server.ranges)} of {count} pinned artifacts with a Range request")
+    print(f"{'finished':>16}: {total / 2 / elapsed / (1 << 20):8.1f}MiB/s, "
+          f"{server.most_active} downloads at once at most")
+    if server.most_active < min(count, 2):
+        failed.append("downloads never overlapped")
+    for reason in failed:
+        print(f"{'FAILED':>16}: {reason}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,58 @@
+"""Launch latency benchmark: cold `run` against the launcher daemon.
+
+Run from the repository root: python -m benchmarks.launch [rounds]
+Both paths load the profile up to the point where the window would be
+created (--dry-run), in a throwaway HOME."""
+
+import os
+import subprocess
+import sys
+import time
+
+from .common import COMMAND, ROOT, summarize, temp_home
+
+
+def main(rounds: int = 20):
+    """Benchmark entry"""
+    with temp_home() as env:
+        name = "bench"
+        subprocess.run(
+            [*COMMAND, "create-profile", name, "https://example.com"],
+            env=env, check=True, stdout=subprocess.DEVNULL
+        )
+
+        cold = []
+        for _ in range(rounds):
+            begin = time.perf_counter()
+            subprocess.run([*COMMAND, "run", name, "--cold", "--dry-run"], env=env, check=True)
+            cold.append(time.perf_counter() - begin)
+
+        sys.path.insert(0, str(ROOT))
+        os.environ["HOME"] = env["HOME"]
+        # pylint: disable=import-outside-toplevel
+        from webapps import launcher
+
+        with subprocess.Popen(
+            [*COMMAND, "launcher-daemon"], env=env, stdout=subprocess.DEVNULL
+        ) as daemon:
+            try:
+                for _ in range(100):
+                    if launcher.request("", wait=False) is not None:
+                        break
+                    time.sleep(0.05)
+                warm = []
+                for _ in range(rounds):
+                    begin = time.perf_counter()
+                    reply = launcher.request(name, dry_run=True)
+                    warm.append(time.perf_counter() - begin)
+                    assert reply and reply.get("ready"), reply
+            finally:
+                daemon.terminate()
+
+        cold_median = summarize("cold", cold)
+        warm_median = summarize("launcher", warm)
+        print(f"{'speedup':>16}: {cold_median / warm_median:.1f}x")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,61 @@
+"""Cold-start benchmark of main.py subcommands.
+
+Run from the repository root: python -m benchmarks.startup [rounds]
+Each subcommand runs under -X importtime in a throwaway HOME. Exits
+non-zero if a lightweight subcommand imports one of the Web UI modules."""
+
+import subprocess
+import sys
+import time
+
+from .common import COMMAND, summarize, temp_home
+
+WEBUI_MODULES = ("webview", "webapps.webui", "requests", "tqdm", "yaml", "sqlite3")
+SUBCOMMANDS = {
+    "--help": ((), ("webview", *WEBUI_MODULES)),
+    "create-profile": (("bench", "https://example.com"), WEBUI_MODULES),
+    "dump": (("bench",), WEBUI_MODULES),
+    "load-missing": (("bench",), WEBUI_MODULES),
+    "search": (("-q", "bench"), WEBUI_MODULES),
+    # run needs webview itself, but nothing else of the Web UI
+    "run": (("bench", "--cold", "--dry-run"), WEBUI_MODULES[1:]),
+}
+
+
+def imports(stderr: str):
+    """Parse -X importtime output into {module: cumulative microseconds}"""
+    found = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        found[module.strip()] = int(cumulative)
+    return found
+
+
+def main(rounds: int = 5):
+    """Benchmark entry"""
+    failed = False
+    with temp_home() as env:
+        for name, (args, forbidden) in SUBCOMMANDS.items():
+            samples = []
+            for _ in range(rounds):
+                begin = time.perf_counter()
+                result = subprocess.run(
+                    [sys.executable, "-X", "importtime", *COMMAND[1:], name, *args],
+                    env=env, check=True, capture_output=True, text=True
+                )
+                samples.append(time.perf_counter() - begin)
+            modules = imports(result.stderr)
+            summarize(name, samples)
+            heaviest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:3]
+            print(" " * 18 + ", ".join(f"{module} {usec / 1000:.1f}ms" for module, usec in heaviest))
+            leaked = [module for module in forbidden if module in modules]
+            if leaked:
+                failed = True
+                print(" " * 18 + f"REGRESSION: imports {', '.join(leaked)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,271 @@
+"""Benchmark suite: profiles, config store and CLI startup, compared to a baseline.
+
+Run from the repository root: python -m benchmarks.suite [--sizes 10,100,1000,10000]
+Each size gets a synthetic profile tree in a throwaway HOME (and so
+CONFIG_DIR), measured in a fresh interpreter where webview is a stub.
+The config store and the cold start of each subcommand are measured on
+the first tree. Results are seconds per operation, written as JSON. With
+a baseline, any median slower than it by more than the tolerance is a
+regression, and the suite exits non-zero."""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from statistics import median, quantiles
+
+from .common import COMMAND, ROOT, temp_home
+
+SIZES = (10, 100, 1000, 10000)
+OUTPUT = ROOT / "benchmarks" / "results.json"
+BASELINE = ROOT / "benchmarks" / "baseline.json"
+TOLERANCE = 0.25
+# Seconds: a median slower by less than this is noise, whatever the ratio
+FLOOR = 5e-5
+# Profiles timed per operation, at most
+SAMPLE = 200
+COPIES = 5
+STORAGE_FILES = 32
+HOSTS = ("example.com", "mail.example.org", "chat.example.net", "docs.example.io")
+WEBVIEW_STUB = '''"""Stand-in for pywebview: the suite measures the app, not the GUI toolkit"""
+settings = {}
+
+
+def create_window(*args, **kwargs):
+    return None
+
+
+def start(*args, **kwargs):
+    return None
+'''
+FIRST = "bench00000"
+STARTUP = {
+    "--help": (),
+    "create-profile": ("created", "https://example.com"),
+    "dump": (FIRST,),
+    "load-missing": (FIRST,),
+    "search": ("-q", "bench0000"),
+    "validate": (FIRST,),
+    "storage": (FIRST,),
+    "run": (FIRST, "--cold", "--dry-run"),
+    "launches": (FIRST,),
+}
+
+
+def stats(samples: list[float]) -> dict:
+    """Median and p95 of samples (s)"""
+    p95 = quantiles(samples, n=20)[-1] if len(samples) > 1 else samples[0]
+    return {"median": median(samples), "p95": p95, "n": len(samples)}
+
+
+def timed(function, arguments) -> list[float]:
+    """Time function once per argument"""
+    samples = []
+    for argument in arguments:
+        begin = time.perf_counter()
+        function(argument)
+        samples.append(time.perf_counter() - begin)
+    return samples
+
+
+def sample(names: list[str]) -> list[str]:
+    """At most SAMPLE names, spread over the whole tree"""
+    step = max(len(names) // SAMPLE, 1)
+    return names[::step][:SAMPLE]
+
+
+# pylint: disable=import-outside-toplevel,protected-access
+def generate(size: int) -> list[str]:
+    """Write a synthetic tree of size profiles, the first one with some storage to copy"""
+    from webapps.profiles import PROFILE_DIR, Profile, batch_saves
+
+    names = [f"bench{index:05d}" for index in range(size)]
+    with batch_saves():
+        for index, name in enumerate(names):
+            url = f"https://{HOSTS[index % len(HOSTS)]}/app/{index}"
+            Profile(name, url, f"Bench {index}").save()
+    storage = PROFILE_DIR / FIRST / "storage"
+    storage.mkdir(parents=True)
+    for index in range(STORAGE_FILES):
+        (storage / f"blob{index}").write_bytes(bytes(16384))
+    return names
+
+
+def measure_profiles(size: int, rounds: int) -> dict[str, dict]:
+    """Profile load/save, the profile list, fetch, deep copy and validation on a tree of size"""
+    from webapps.profiles import Profile, validate_profiles
+    from webapps.webui.jobs import JOBS
+    from webapps.webui.webview_api import WebviewAPI
+
+    names = generate(size)
+    picked = sample(names)
+    api = WebviewAPI()
+    results = {}
+
+    def record(operation: str, samples: list[float]):
+        results[f"profiles.{size}.{operation}"] = stats(samples)
+
+    record("load", timed(Profile.load, picked))
+    loaded = [Profile.load(name) for name in picked]
+
+    def save(profile: Profile):
+        # A changed title, or the unchanged file would not be written at all
+        profile._data = profile.data._replace(title=profile.data.title + "!")
+        profile.save()
+
+    record("save", timed(save, loaded))
+    record("validate", timed(lambda profile: profile.validate(), loaded))
+    # The first listing builds the catalog, later ones only check what changed
+    record("profile_list.cold", timed(lambda _: api.profile_list(), range(1)))
+    record("profile_list", timed(lambda _: api.profile_list(), range(rounds)))
+    record("fetch_profile", timed(api.fetch_profile, picked))
+    record("validate_profiles", timed(lambda _: validate_profiles(), range(rounds)))
+
+    def deep_copy(index: int):
+        job = JOBS.get(api.deep_copy(FIRST, f"copy{index}")["job"])
+        while job.state in ("queued", "running"):
+            time.sleep(0.001)
+        assert job.state == "done", job.error
+
+    record("deep_copy", timed(deep_copy, range(COPIES)))
+    return results
+
+
+def measure_config(rounds: int) -> dict[str, dict]:
+    """ConfigAPI get and set, through the read cache and without it"""
+    from webapps.webui.config_api import ConfigAPI
+
+    keys = [f"key{index}" for index in range(SAMPLE)]
+    cached = ConfigAPI()
+    uncached = ConfigAPI(cache_size=0)
+    results = {"config.set": stats(timed(lambda key: cached.set(key, {"value": key}), keys))}
+    for label, store in (("config.get", cached), ("config.get.uncached", uncached)):
+        samples = []
+        for _ in range(rounds):
+            samples += timed(store.get, keys)
+        results[label] = stats(samples)
+    return results
+
+
+def measure_startup(env: dict, rounds: int) -> dict[str, dict]:
+    """Cold start of each subcommand"""
+    results = {}
+    for name, args in STARTUP.items():
+        samples = []
+        for _ in range(rounds):
+            begin = time.perf_counter()
+            subprocess.run(
+                [*COMMAND, name, *args], env=env, cwd=ROOT, check=True,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            samples.append(time.perf_counter() - begin)
+        results[f"startup.{name.strip('-')}"] = stats(samples)
+    return results
+
+
+def worker(kind: str, size: int, rounds: int, into: str):
+    """Measure in this process, whose HOME is the tree to measure, and write the results to into"""
+    results = measure_profiles(size, rounds) if kind == "profiles" else measure_config(rounds)
+    Path(into).write_text(json.dumps(results), encoding="utf-8")
+
+
+def run_worker(env: dict, kind: str, size: int, rounds: int) -> dict[str, dict]:
+    """Run a worker in a fresh interpreter, return its results"""
+    with tempfile.NamedTemporaryFile(suffix=".json") as into:
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.suite", "--worker", kind, "--sizes", str(size),
+             "--rounds", str(rounds), "--into", into.name],
+            env=env, cwd=ROOT, check=True, stdout=subprocess.DEVNULL
+        )
+        return json.loads(Path(into.name).read_text(encoding="utf-8"))
+
+
+def measure(sizes: list[int], rounds: int) -> dict[str, dict]:
+    """Every measurement, one throwaway HOME per size"""
+    results = {}
+    for index, size in enumerate(sizes):
+        with temp_home() as env:
+            stub = Path(env["HOME"]) / "stub" / "webview"
+            stub.mkdir(parents=True)
+            (stub / "__init__.py").write_text(WEBVIEW_STUB, encoding="utf-8")
+            env["PYTHONPATH"] = os.pathsep.join((str(stub.parent), str(ROOT)))
+            begin = time.perf_counter()
+            results.update(run_worker(env, "profiles", size, rounds))
+            print(f"{size:>6} profiles measured in {time.perf_counter() - begin:.1f}s")
+            if index == 0:
+                results.update(run_worker(env, "config", size, rounds))
+                results.update(measure_startup(env, rounds))
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Print results next to the baseline, return the regressed operations"""
+    regressed = []
+    for key, now in sorted(results.items()):
+        before = baseline.get(key)
+        line = f"{key:<36}{now['median'] * 1000:10.3f}ms"
+        if before is None:
+            print(f"{line}  (new)")
+            continue
+        ratio = now["median"] / before["median"] if before["median"] else float("inf")
+        line += f"{before['median'] * 1000:10.3f}ms{ratio:8.2f}x"
+        if ratio > 1 + tolerance and now["median"] - before["median"] > FLOOR:
+            regressed.append(key)
+            line += "  REGRESSION"
+        print(line)
+    return regressed
+
+
+def main():
+    """Benchmark entry"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)))
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--output", type=Path, default=OUTPUT)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--worker", choices=("profiles", "config"), help=argparse.SUPPRESS)
+    parser.add_argument("--into", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+    if args.worker:
+        worker(args.worker, sizes[0], args.rounds, args.into)
+        return
+
+    results = measure(sizes, args.rounds)
+    report = {
+        "meta": {
+            "time": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "rounds": args.rounds,
+        },
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=1), encoding="utf-8")
+    print(f"Results written to {args.output}")
+    try:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))["results"]
+    except FileNotFoundError:
+        baseline = {}
+        print(f"No baseline at {args.baseline}, run with --save-baseline to make one")
+    print(f"{'operation':<36}{'median':>12}{'baseline':>12}{'ratio':>9}")
+    regressed = compare(results, baseline, args.tolerance)
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=1), encoding="utf-8")
+        print(f"Baseline saved to {args.baseline}")
+    elif regressed:
+        print(f"REGRESSION: {', '.join(regressed)} slower than {args.baseline} "
+              f"by more than {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -39,6 +39,7 @@ async function init_alert() {
 async function pywebview_config_store_seeder() {
   setLog("Seeding probably unitialized config store");
   await system.config.set_if_not_exists("theme", DEFAULT_THEME);
+  await system.config.set_if_not_exists("shared_host", false);
 }
 
 async function post_pywebview_init() {
@@ -6,17 +6,49 @@ import { config } from "./vendor/enigmarimu.js/config.mjs";
 import { setup, goto } from "./vendor/enigmarimu.js/pages.mjs";
 import { ValueError } from "./errors.mjs";
 /** @typedef {import('./types.mjs').Profile} Profile */
+/** @typedef {import('./types.mjs').ProfilePage} ProfilePage */
+/** @typedef {import('./types.mjs').ProfileEvent} ProfileEvent */
+/** @typedef {import('./types.mjs').JobStatus} JobStatus */
 
 const CONFIG_STATE = {
   profile_name: '',
 };
 
+const LISTING_STATE = {
+  offset: 0,
+  total: 0,
+  page_size: 50,
+  sort: 'name',
+};
+
 const PROFILE_FORM = {
   name: '',
   path: '',
   app: {},
   start: {},
-  config: {}
+  config: {},
+  limits: {}
+}
+
+/** Changed fields of a profile, by section
+ * @param {Profile} before
+ * @param {Profile} after
+ * @returns {Object<string, Object<string, any>>}
+ */
+function profileDelta(before, after) {
+  /** @type {Object<string, Object<string, any>>} */
+  const delta = {};
+  for (const section of ["app", "start", "config", "limits"]) {
+    // @ts-ignore
+    const old = before[section] || {}, current = after[section] || {};
+    for (const key of Object.keys(current)) {
+      if (JSON.stringify(old[key] ?? null) === JSON.stringify(current[key] ?? null))
+        continue;
+      delta[section] = delta[section] || {};
+      delta[section][key] = current[key];
+    }
+  }
+  return delta;
 }
 
 /** Function to gather data from the form into an object
@@ -93,7 +125,7 @@ const ACTIONS = {
    */
   async exec(profile_name) {
     setLog(`Executing ${profile_name}`);
-    await system.webview.execute(profile_name);
+    await system.webview.execute(profile_name, await system.config.get("shared_host") === true);
   },
 
   /**
@@ -102,7 +134,7 @@ const ACTIONS = {
    */
   async private_exec(profile_name) {
     setLog(`Executing ${profile_name}`);
-    await system.webview.pexec(profile_name);
+    await system.webview.pexec(profile_name, await system.config.get("shared_host") === true);
   },
 
   /**
@@ -132,7 +164,10 @@ const ACTIONS = {
           const profile_new = collectFormData(); // Gather form data into an object
 
           profile_new.name = profile_name;
-          await system.webview.patch_profile(profile_new); // Call the save function
+          // Only the edited fields cross the bridge
+          const delta = profileDelta(profile, profile_new);
+          if (Object.keys(delta).length > 0)
+            await system.webview.patch_profile_delta(profile_name, delta);
           await goto("/");
           return;
         });
@@ -198,7 +233,6 @@ const ACTIONS = {
   async delete(name) {
     console.debug('delete', name)
     await system.webview.delete_profile(name)
-    await renderProfileList()
   },
 
   /**
@@ -213,7 +247,6 @@ const ACTIONS = {
     const formdata = collectFormData(form, {})
     // console.debug(formdata, 'rename')
     await system.webview.rename(formdata.rename.old, formdata.rename.new)
-    await renderProfileList()
     const form_base = form.getAttribute('data-parent')
     if (form_base)
       await this.push_back(form_base)
@@ -230,7 +263,6 @@ const ACTIONS = {
     // @ts-ignore
     const formdata = collectFormData(form, {})
     await system.webview.shallow_copy(formdata.rename.old, formdata.rename.new)
-    await renderProfileList()
     // console.debug(formdata, 'shcopy')
     const form_base = form.getAttribute('data-parent')
     if (form_base)
@@ -249,7 +281,6 @@ const ACTIONS = {
     const formdata = collectFormData(form, {})
     // console.debug(formdata, 'dcopy')
     await system.webview.deep_copy(formdata.rename.old, formdata.rename.new)
-    await renderProfileList()
     const form_base = form.getAttribute('data-parent')
     if (form_base)
       await this.push_back(form_base)
@@ -258,6 +289,10 @@ const ACTIONS = {
   async back() {
     await goto("/");
   },
+
+  async load_more() {
+    await renderProfilePage();
+  },
 };
 
 /**
@@ -308,8 +343,9 @@ function bound_buttons(base = document) {
   if (base === null) {
     throw new ValueError("Base element must be defined. You probably forgot that the value used is not found.")
   }
-  const buttons = base.querySelectorAll("[data-action]");
+  const buttons = base.querySelectorAll("[data-action]:not([data-action-bound])");
   buttons.forEach((button) => {
+    button.setAttribute("data-action-bound", "");
     const [action, profileName] = (button.getAttribute("data-action") || '').split(":");
     const action_prevention = JSON.parse(button.getAttribute('data-action-prevent') || 'true')
     // console.debug(`Action default prevention? ${action_prevention}`)
@@ -328,28 +364,103 @@ function bound_buttons(base = document) {
 }
 
 async function renderProfileList() {
+  LISTING_STATE.offset = 0;
+  LISTING_STATE.total = 0;
+  $("#lists").empty()
+  return await renderProfilePage();
+}
+
+async function renderProfilePage() {
   return await Template.with_url("listing", "template/listing.html", 50, true).then(
-    (template) => {
-      $("#lists").empty()
-      system.webview.profile_list().then((profiles) => {
-        /** @type {HTMLElement} */
-        // @ts-ignore
-        const target = document.querySelector("#lists");
-        const profileData = profiles.map((profile) => ({
-          name: profile.name,
-          path: profile.path,
-        }));
-        template.batch_append("#lists", profileData);
-        bound_buttons(target);
-        // const dropdownElementList = document.querySelectorAll('.dropdown-toggle')
-        // const _ = [...dropdownElementList].map(dropdownToggleEl => new bootstrap.Dropdown(dropdownToggleEl))
-
-        console.log("All profiles rendered and buttons bound.");
-      });
+    async (template) => {
+      /** @type {ProfilePage} */
+      const page = await system.webview.list_profiles(
+        LISTING_STATE.offset,
+        LISTING_STATE.page_size,
+        LISTING_STATE.sort
+      );
+      template.batch_append("#lists", page.items);
+      LISTING_STATE.offset = page.offset + page.items.length;
+      LISTING_STATE.total = page.total;
+      const more = document.querySelector("#load-more");
+      if (more)
+        more.classList.toggle("d-none", LISTING_STATE.offset >= LISTING_STATE.total);
+      bound_buttons(document.querySelector("#app") || document.body);
+      // const dropdownElementList = document.querySelectorAll('.dropdown-toggle')
+      // const _ = [...dropdownElementList].map(dropdownToggleEl => new bootstrap.Dropdown(dropdownToggleEl))
+
+      console.log(`Rendered ${LISTING_STATE.offset}/${LISTING_STATE.total} profiles and bound buttons.`);
     }
   );
 }
 
+/** Fetch the loaded part of the listing again, in sort order and as long as it was */
+async function relistLoaded() {
+  const template = await Template.with_url("listing", "template/listing.html", 50, true);
+  /** @type {ProfilePage} */
+  const page = await system.webview.list_profiles(
+    0,
+    Math.max(LISTING_STATE.offset, LISTING_STATE.page_size),
+    LISTING_STATE.sort
+  );
+  $("#lists").empty();
+  template.batch_append("#lists", page.items);
+  LISTING_STATE.offset = page.items.length;
+  LISTING_STATE.total = page.total;
+}
+
+/**
+ * Apply profile events pushed by the directory watcher to the listing
+ * @param {ProfileEvent[]} events
+ */
+async function applyProfileEvents(events) {
+  for (const event of events)
+    setLog(`Profile ${event.name} ${event.type}`);
+  const lists = document.querySelector("#lists");
+  if (!lists)
+    return;
+  let relist = false;
+  for (const event of events) {
+    if (event.type === "deleted" || event.type === "renamed") {
+      const name = event.type === "renamed" ? event.from : event.name;
+      const item = lists.querySelector(`[data-id="profile-id:${CSS.escape(name || '')}"]`);
+      if (item) {
+        item.remove();
+        LISTING_STATE.offset--;
+      }
+      LISTING_STATE.total--;
+    }
+    if (event.type === "created" || event.type === "renamed") {
+      LISTING_STATE.total++;
+      // Removing keeps the order, but a new name may belong anywhere in it
+      relist = true;
+    }
+  }
+  if (relist)
+    await relistLoaded();
+  const more = document.querySelector("#load-more");
+  if (more)
+    more.classList.toggle("d-none", LISTING_STATE.offset >= LISTING_STATE.total);
+  // @ts-ignore
+  bound_buttons(lists);
+}
+
+window.addEventListener("job-progress", (event) => {
+  /** @type {JobStatus} */
+  // @ts-ignore
+  const job = event.detail;
+  const percent = job.bytes_total > 0 ? Math.floor(job.bytes_done * 100 / job.bytes_total) : 0;
+  if (job.state === "running")
+    setLog(`${job.kind} ${job.target}: ${percent}% (${job.files_done}/${job.files_total} files)`);
+  else
+    setLog(`${job.kind} ${job.target}: ${job.state}${job.error ? ` (${job.error})` : ''}`);
+});
+
+window.addEventListener("profiles-changed", (event) => {
+  // @ts-ignore
+  applyProfileEvents(event.detail);
+});
+
 async function renderRenameModal(profile_name, template_data) {
   return await Template.with_url("rename", "template/rename.html", 50, true).then(
     async (template) => {
@@ -389,6 +500,11 @@ async function init_navbar() {
       goto(url)
     })
   })
+  /** @type {HTMLInputElement} */
+  // @ts-ignore
+  const shared = base.querySelector("#shared-host-input");
+  shared.checked = await system.config.get("shared_host") === true;
+  shared.addEventListener("change", () => system.config.set("shared_host", shared.checked));
 }
 
 async function main() {
@@ -5,11 +5,28 @@
  * @prop {function(): Promise<string>} app_name Application Name
  * @prop {function(): Promise<string>} short_name Application Short Name
  * @prop {function(): Promise<string>} version Application version 
+ * @prop {function(): Promise<{enabled: boolean, methods: Object<string, MethodMetrics>}>} metrics Per-method call metrics, when the Web UI runs with --metrics
  * @prop {OSAPI} os OS API
  * @prop {WebviewAPI} webview Webview API
  * @prop {ConfigAPI} config Config Store
  */
 
+/**
+ * Calls of one API method, latencies in milliseconds
+ * @typedef MethodMetrics
+ * @type {object}
+ *
+ * @property {number} calls Number of calls
+ * @property {Object<string, number>} errors Raised exceptions by type
+ * @property {number} mean_ms Mean latency
+ * @property {number} p50_ms Median latency
+ * @property {number} p95_ms 95th percentile latency
+ * @property {number} p99_ms 99th percentile latency
+ * @property {number} max_ms Slowest call
+ * @property {number} bytes_in Arguments, as JSON
+ * @property {number} bytes_out Results, as JSON
+ */
+
 
 /**
  * @typedef ValidationEntry Validation Entry
@@ -30,6 +47,98 @@
  * @property {WindowConfig} app Profile window config
  * @property {StartConfig} start Profile initial/start config
  * @property {WebviewConfig} config Profile webview config
+ * @property {Limits} [limits] Profile resource limits
+ */
+
+/**
+ * Profile summary, a projection of Profile used by the listing
+ * @typedef ProfileSummary
+ * @type {object}
+ *
+ * @property {string} name Profile name
+ * @property {string} path Profile path
+ * @property {string} host URL host
+ * @property {number} modified Last modification time of the config, in seconds
+ * @property {{title: string, url: string?}} app Profile window config, title and URL only
+ */
+
+/**
+ * A page of profile summaries
+ * @typedef ProfilePage
+ * @type {object}
+ *
+ * @property {number} total Total number of profiles
+ * @property {number} offset Offset of the first item
+ * @property {ProfileSummary[]} items Profiles in this page
+ */
+
+/**
+ * A profile change seen by the directory watcher, pushed as a "profiles-changed" event
+ * @typedef ProfileEvent
+ * @type {object}
+ *
+ * @property {"created" | "modified" | "renamed" | "deleted"} type What happened
+ * @property {string} name Profile name (the new one, when renamed)
+ * @property {string} [from] Previous name, when renamed
+ * @property {ProfileSummary?} [profile] Summary of the profile, unless deleted
+ */
+
+/**
+ * State of a background job, also pushed as a "job-progress" event
+ * @typedef JobStatus
+ * @type {object}
+ *
+ * @property {string} id Job id
+ * @property {string} kind deep_copy, delete or purge
+ * @property {string} target Profile the job works on
+ * @property {"queued" | "running" | "done" | "failed" | "cancelled"} state Job state
+ * @property {number} bytes_done Bytes processed so far
+ * @property {number} bytes_total Bytes to process
+ * @property {number} files_done Files processed so far
+ * @property {number} files_total Files to process
+ * @property {string?} error Error message, when failed
+ * @property {any} result Result, when done
+ */
+
+/**
+ * A running profile, also pushed as a list in an "apps-changed" event
+ * @typedef AppStatus
+ * @type {object}
+ *
+ * @property {string} name Profile name
+ * @property {boolean} private Whether it runs in private mode
+ * @property {number} pid Process id, of the host when shared
+ * @property {boolean} shared Whether it is a window of a shared host
+ * @property {number} uptime Seconds since it started
+ * @property {number?} rss Resident memory in bytes, when known
+ * @property {number?} cpu CPU time in seconds, when known
+ */
+
+/**
+ * One traced launch, from the click to the first paint. Phases are spawn,
+ * interpreter, imports, profile, window, loaded and shown; each lasts from
+ * the previous one stamped
+ * @typedef LaunchTrace
+ * @type {object}
+ *
+ * @property {string} id Trace id
+ * @property {string} profile Profile name
+ * @property {boolean} private Whether it was launched in private mode
+ * @property {number} started When it was launched, in seconds since the epoch
+ * @property {Object<string, number>} phases Seconds taken by each phase
+ * @property {number} total Seconds from the launch to the last phase
+ * @property {string?} error Why the launch failed
+ */
+
+/**
+ * Launch latencies of one profile, in milliseconds, failed launches left out
+ * @typedef LaunchReport
+ * @type {object}
+ *
+ * @property {number} count Traced launches
+ * @property {number} errors Failed launches
+ * @property {{p50_ms: number, p95_ms: number, max_ms: number}} total Whole launch
+ * @property {Object<string, {p50_ms: number, p95_ms: number, max_ms: number}>} phases By phase
  */
 
 /**
@@ -79,6 +188,19 @@
  * @prop {bool} OPEN_DEVTOOL_IN_DEBUG Will the app open DEVTOOL in debug mode?
  */
 
+/**
+ * Resource limits of the launched app, null means unlimited
+ * @typedef Limits
+ * @type {object}
+ *
+ * @prop {number?} memory Data segment limit in MiB
+ * @prop {number?} address_space Virtual memory limit in MiB
+ * @prop {number?} nice CPU nice level, -20 to 19
+ * @prop {string?} io_class I/O class: realtime, best-effort or idle
+ * @prop {number?} io_level I/O priority within the class, 0 to 7
+ * @prop {string?} cpus CPUs the app may run on, e.g. 0-3,6
+ */
+
 /**
  * @typedef OSAPI
  * @type {object}
@@ -92,16 +214,30 @@
  * @type {object}
  *
  * @prop {function(): Promise<Profile[]>} profile_list Returns an array of Profile
+ * @prop {function(number, number, string, string[]?, boolean?): Promise<ProfilePage>} list_profiles Returns a sorted page of profile summaries (offset, limit, sort, fields, reverse)
  * @prop {function(string): Promise<Profile>} fetch_profile Returns a specific Profile
- * @prop {function(string): Promise<null>} execute Execute a profile
- * @prop {function(string): Promise<null>} pexec Private execute a profile
+ * @prop {function(string, boolean?): Promise<null>} execute Execute a profile, in a shared host if asked
+ * @prop {function(string, boolean?): Promise<null>} pexec Private execute a profile, in a shared host if asked
+ * @prop {function(): Promise<AppStatus[]>} running_apps Returns every running profile
+ * @prop {function(string): Promise<number>} stop_app Stop a running profile, returns how many instances were stopped
+ * @prop {function(string): Promise<number[]>} restart_app Restart a running profile, returns the new pids
+ * @prop {function(string[]?): Promise<Object<string, LaunchReport>>} launch_report Launch latency distributions by profile
+ * @prop {function(string, number?): Promise<LaunchTrace[]>} launch_history Latest launch traces of a profile, newest first
  * @prop {function(Profile): Promise<ValidationEntry[]>} patch_profile Save profile configuration
+ * @prop {function(string, Object<string, Object<string, any>>): Promise<ValidationEntry[]>} patch_profile_delta Save only the changed fields of a profile, null resets a field
+ * @prop {function(Profile[]): Promise<Object<string, ValidationEntry[]>>} patch_profiles Save several profiles at once, returns validation errors by name
  * @prop {function(string, string): Promise<null>} rename Rename a profile
  * @prop {function(string, string): Promise<string>} shallow_copy Shallow copy a profile
- * @prop {function(string, string): Promise<string>} deep_copy Deep copy a profile (this copies application data as well)
- * @prop {function(string): Promise<null>} delete_profile Delete a profile
+ * @prop {function(string, string, boolean?): Promise<{job: string} | string>} deep_copy Deep copy a profile (this copies application data as well, browser caches unless skipped) in the background, returns the job id or an error. The job result tells the bytes copied and shared
+ * @prop {function(string[]?, boolean?): Promise<Object<string, {path: string, bytes: number, cache: number, files: number}>>} storage_usage Returns disk usage of profiles by name
+ * @prop {function(number|string?, number?, number|string?, string[]?, boolean?): Promise<{job: string}>} prune_storage Trim browser caches (max size per profile, max age in days, global budget, names, dry run) in the background
+ * @prop {function(string): Promise<JobStatus?>} job_status Returns the status of a job
+ * @prop {function(): Promise<JobStatus[]>} job_list Returns the status of every recent job
+ * @prop {function(string): Promise<boolean>} cancel_job Cancel a job, returns whether it could be
+ * @prop {function(string): Promise<{job: string}>} delete_profile Delete a profile in the background, returns the job id
  * @prop {function(Profile): Promise<ValidationEntry[]>} new_profile Save a new profile configuration
  * @prop {function(Profile): Promise<ValidationEntry[]>} validate_profile Validate a profile state
+ * @prop {function(string[]?): Promise<Object<string, ValidationEntry[]>>} validate_profiles Validate every profile on disk, returns the failures by name
  * @prop {function(): Promise<Profile>} provide_default Returns a default Profile
  * @prop {function(): Promise<never>} error just raise an exception
  */
@@ -114,4 +250,9 @@
  * @prop {function(string, any): Promise<null>} set Set a data to config store
  * @prop {function(string): Promise<Number>} delete Delete a data from config store
  * @prop {function(string, any): Promise<null>} set_if_not_exists Set a data to config store IF not exists
+ * @prop {function(string[]): Promise<Object.<string, any>>} get_many Fetch several data from config store at once
+ * @prop {function(Object.<string, any>): Promise<null>} set_many Set several data to config store at once
+ * @prop {function(string[]): Promise<Number>} delete_many Delete several data from config store at once
+ * @prop {function(): Promise<null>} flush Commit deferred writes now
+ * @prop {function(): Promise<{hits: number, misses: number, size: number, capacity: number}>} cache_stats Read cache counters
  */
\ No newline at end of file
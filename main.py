@@ -1,11 +1,10 @@
-from argh import ArghParser, arg
-import webview
-from webapps.profiles import Profile, annihilate_defconst, PROFILE_DIR
-from webapps.webui import api
-from webapps.webui.dependency import install_webui_dependency
-from webapps.webui.logs import setup_logging
+# pylint: disable=import-outside-toplevel
+# Subcommands import what they use, so `run` and `dump` don't pay for the Web UI.
+from time import time
 
-setup_logging()
+STARTED = time()
+
+from argh import ArghParser, arg  # pylint: disable=wrong-import-position
 
 #@arg("link", help="Link or name")
 #def main(link: str):
@@ -17,31 +16,42 @@ setup_logging()
 @arg("--title", '-t', help="Profile Title")
 def create_profile(name: str, url: str, title: str | None = None):
     """Create profile"""
+    from webapps.profiles import Profile
     profile = Profile(name, url, title)
     profile.save()
     print("Profile created")
 
-@arg("name", help="Name of the profile")
+@arg("names", help="Names of the profiles, several open as windows of one shared host")
 @arg('-p', '--private', help="Open the profile in private? This omit private configuration")
-def run(name: str, private: bool = False):
+@arg('--cold', help="Always start in this process, even if the launcher is running")
+@arg('--dry-run', help="Load the profile, but don't open the window")
+@arg('--shared', help="Open in a shared host process, attaching to one already running")
+def run(*names, private: bool = False, cold: bool = False, dry_run: bool = False,
+        shared: bool = False):
     """Execute from profile"""
-    profile = Profile.load(name)
-    data = annihilate_defconst(profile.data._asdict())
-    start = annihilate_defconst(profile.start_data._asdict())
-    settings = annihilate_defconst(profile.common_config._asdict())
-    if private:
-        data['title'] += " (Private Mode)"
-        start['private_mode'] = True
-    if profile.data.url in (None, ''):
-        print(f"Please change URL entry for {name} at {PROFILE_DIR / name / 'config.conf'}")
+    if not names:
+        raise SystemExit("Give at least one profile name")
+    from webapps.tracing import Trace
+    # Set when the Web UI launched this process and wants to know how long it took
+    trace = Trace.from_env(STARTED)
+    if shared or len(names) > 1:
+        from webapps.host import run_shared
+        run_shared(list(names), private, dry_run, trace)
         return
-    webview.settings = settings
-    webview.create_window(**data)
-    webview.start(**start)
+    from webapps import launcher
+    name = names[0]
+    if not cold:
+        reply = launcher.request(name, private, dry_run)
+        if reply is not None:
+            if reply.get("error"):
+                print(reply["error"])
+            return
+    launcher.launch(name, private, dry_run, trace=trace)
 
 @arg("name", help="Name of the profile")
 def dump(name):
     """Dump profile data"""
+    from webapps.profiles import Profile, annihilate_defconst
     profile = Profile.load(name)
     data = annihilate_defconst(profile.data._asdict())
     start = annihilate_defconst(profile.start_data._asdict())
@@ -53,20 +63,150 @@ def dump(name):
 @arg("name", help="Name of the profile")
 def load_missing(name):
     """Load missing configuration"""
+    from webapps.profiles import Profile
     profile = Profile.load(name)
     profile.load_missing()
 
-def webui():
+@arg("--query", "-q", help="Substring of profile name or title")
+@arg("--prefix", help="Match the start of profile name or title instead")
+@arg("--host", help="URL host, subdomains included")
+@arg("--flag", "-f", action="append", help="Boolean flag, e.g. 'on_top' or 'private_mode=no'")
+def search(query: str | None = None, prefix: bool = False, host: str | None = None, flag=None):
+    """Search profiles"""
+    from webapps.search import INDEX
+    flags = {}
+    for item in flag or ():
+        key, _, value = item.partition("=")
+        flags[key] = value.lower() not in ("no", "false", "0")
+    for name in INDEX.search(query, prefix, host, flags):
+        print(name)
+
+@arg("names", help="Profile names, every profile if omitted")
+def validate(*names):
+    """Validate profiles, exit with 1 if any is invalid"""
+    from webapps.profiles import validate_profiles
+    failures = validate_profiles(names or None)
+    for name, errors in failures.items():
+        for error in errors:
+            print(f"{name}: {error['of']}: {error['message']}")
+    if failures:
+        raise SystemExit(1)
+
+@arg("names", help="Profile names, every profile if omitted")
+@arg("--fresh", help="List every directory again instead of trusting cached results")
+def storage(*names, fresh: bool = False):
+    """Show disk usage of profiles"""
+    from webapps.storage import SCANNER, format_size
+    usage = SCANNER.usage(names or None, fresh)
+    for name, info in sorted(usage.items(), key=lambda item: -item[1]["bytes"]):
+        print(f"{format_size(info['bytes']):>10} {format_size(info['cache']):>10} cache  {name}")
+    print(f"{format_size(sum(info['bytes'] for info in usage.values())):>10} total")
+
+@arg("names", help="Profile names, every profile if omitted")
+@arg("--max-size", help="Per profile limit, e.g. 500M")
+@arg("--max-age", help="Days after which cache entries go")
+@arg("--budget", help="Limit for every profile together, e.g. 5G")
+@arg("--dry-run", help="Only tell what would be freed")
+def prune(*names, max_size: str | None = None, max_age: float | None = None,
+          budget: str | None = None, dry_run: bool = False):
+    """Trim browser caches of profiles, leaving cookies and local storage alone"""
+    from webapps.storage import PrunePolicy, format_size, parse_size
+    from webapps.storage import prune as prune_storage
+    policy = PrunePolicy(
+        None if max_size is None else parse_size(max_size),
+        None if max_age is None else float(max_age) * 86400,
+        None if budget is None else parse_size(budget),
+    )
+    report = prune_storage(policy, names or None, dry_run)
+    for name, info in report["profiles"].items():
+        print(f"{format_size(info['freed']):>10} {info['files']:>7} files  {name}")
+    for name, path in report["skipped"].items():
+        print(f"Skipped {name}: storage path {path} is outside the profile directory")
+    verb = "Would free" if dry_run else "Freed"
+    print(f"{verb} {format_size(report['freed'])} in {report['files']} files")
+
+@arg("--serve", help="Serve the Web UI from a local HTTP server, with compressed and cached assets")
+@arg("--metrics", help="Time every API call, see api.metrics() and logs/api-metrics.jsonl")
+def webui(serve: bool = False, metrics: bool = False):
     """Web UI"""
+    import webview
+    from webapps.webui import api
+    from webapps.webui.bundle import DATA_DIR, entry_point
+    from webapps.webui.dependency import install_webui_dependency
+    from webapps.webui.logs import setup_logging
+
+    from webapps.webui.events import EVENTS
+    from webapps.webui.jobs import JOBS, purge_leftovers
+    from webapps.webui.traces import TRACES
+    from webapps.webui.watcher import ProfileWatcher, sync_profiles
+
+    setup_logging()
     install_webui_dependency()
-    webview.create_window(api.app_name(), 'data/main.html', js_api=api)
+    if metrics:
+        from webapps.webui.metrics import METRICS, instrument_api
+        instrument_api(api)
+        METRICS.start()
+    # The bundle from webui_build, unless it is missing or out of date
+    page = entry_point()
+    if serve:
+        from webapps.webui.assets import AssetServer
+        url = AssetServer().start().url(page)
+    else:
+        url = (DATA_DIR / page).as_posix()
+    window = webview.create_window(api.app_name(), url, js_api=api)
+    EVENTS.attach(window)
+    TRACES.start()
+    ProfileWatcher(sync_profiles).start()
+    JOBS.submit("purge", "leftovers", purge_leftovers)
     webview.start(debug=True)
 
+@arg("names", help="Profiles to report on, every traced one if none")
+@arg("--last", help="List the latest launches of each profile instead")
+def launches(*names, last: int = 0):
+    """Launch latency by phase, from the launches made by the Web UI"""
+    from webapps.webui.traces import LaunchHistory
+    from webapps.tracing import PHASES
+    history = LaunchHistory()
+    if last:
+        for name in names or history.report():
+            for trace in history.history(name, last):
+                phases = trace["phases"].items()
+                phases = " ".join(f"{phase}={took * 1000:.0f}" for phase, took in phases)
+                print(f"{name}: {trace['total'] * 1000:.0f}ms {trace['error'] or phases}")
+        return
+    for name, report in history.report(list(names)).items():
+        print(f"{name}: {report['count']} launches, {report['errors']} failed")
+        rows = [("total", report["total"])]
+        rows += [(phase, report["phases"][phase]) for phase in PHASES if phase in report["phases"]]
+        for label, found in rows:
+            print(f"  {label:<12}p50 {found['p50_ms']:>8.1f}ms  p95 {found['p95_ms']:>8.1f}ms"
+                  f"  max {found['max_ms']:>8.1f}ms")
+
+def launcher_daemon():
+    """Run the launcher daemon, keeping a warm interpreter for run"""
+    from webapps import launcher
+    launcher.serve()
+
+def webui_build():
+    """Bundle the Web UI: content-hashed modules, inlined templates, compressed variants"""
+    from webapps.webui.bundle import build, brotli
+    from webapps.storage import format_size
+    manifest = build()
+    sizes = manifest["compressed"].values()
+    raw, packed = sum(size[0] for size in sizes), sum(size[1] for size in sizes)
+    print(f"{len(manifest['files'])} files, {len(manifest['templates'])} templates inlined")
+    print(f"{format_size(raw)} compressed to {format_size(packed)} (gzip)")
+    if brotli is not None:
+        print(f"{format_size(sum(size[2] for size in sizes))} with brotli")
+
 def webui_reinstall():
     """Web UI reinstall"""
+    from webapps.webui.dependency import install_webui_dependency
     install_webui_dependency(True)
 
 if __name__ == '__main__':
     parser = ArghParser()
-    parser.add_commands([create_profile, run, dump, load_missing, webui, webui_reinstall])
+    parser.add_commands([create_profile, run, dump, load_missing, search, validate, storage,
+                         prune, webui, webui_build, webui_reinstall, launches,
+                         launcher_daemon])
     parser.dispatch()
@@ -0,0 +1,197 @@
+"""Profile catalog"""
+
+import os
+from json import dump, load
+from threading import RLock
+from typing import Any, Iterable
+from urllib.parse import urlparse
+
+from webapps.profiles import CONFIG_DIR, PROFILE_DIR, Profile
+
+CATALOG_FILE = CONFIG_DIR / "catalog.json"
+CATALOG_VERSION = 3
+
+Stamp = list[int] | None
+SUMMARY_FIELDS = ("name", "path", "host", "modified", "app/title", "app/url")
+SORT_KEYS = ("name", "title", "host", "modified")
+
+
+def host_of(url: Any) -> str:
+    """Return the host part of an URL, empty if there's none"""
+    if not isinstance(url, str):
+        return ""
+    return urlparse(url).hostname or ""
+
+
+def project(record: dict[str, Any], fields: Iterable[str]):
+    """Keep only the slash-separated field paths (like data-bind) of a record"""
+    projected: dict[str, Any] = {}
+    for field in fields:
+        *parents, key = field.split("/")
+        source: Any = record
+        for parent in parents:
+            source = source.get(parent) if isinstance(source, dict) else None
+        if not isinstance(source, dict) or key not in source:
+            continue
+        target = projected
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[key] = source[key]
+    return projected
+
+
+def stamp_of(name: str) -> Stamp:
+    """Return (mtime_ns, size) of a profile's config file, None if it has none"""
+    try:
+        stat = os.stat(PROFILE_DIR / name / "config.conf")
+    except FileNotFoundError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class Catalog:
+    """On-disk cache of parsed profiles, keyed by config mtime and size"""
+
+    def __init__(self, path=CATALOG_FILE) -> None:
+        self._path = path
+        self._entries: dict[str, dict[str, Any]] = {}
+        self._loaded = False
+        self._dirty = False
+        self._lock = RLock()
+
+    def _read(self):
+        self._loaded = True
+        try:
+            with open(self._path, encoding="utf-8") as file:
+                data = load(file)
+        except (FileNotFoundError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get("version") != CATALOG_VERSION:
+            return
+        self._entries = data.get("profiles", {})
+
+    def _flush(self):
+        if not self._dirty:
+            return
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self._path.with_suffix(".tmp")
+        with open(temp, "w", encoding="utf-8") as file:
+            dump({"version": CATALOG_VERSION, "profiles": self._entries}, file)
+        os.replace(temp, self._path)
+        self._dirty = False
+
+    def _entry(self, name: str):
+        stamp = stamp_of(name)
+        entry = self._entries.get(name)
+        if entry is not None and entry["stamp"] == stamp:
+            return entry
+        entry = {"stamp": stamp, "data": Profile.load_return(name)}
+        self._entries[name] = entry
+        self._dirty = True
+        return entry
+
+    @staticmethod
+    def _record(name: str, entry: dict[str, Any]):
+        return {"name": name, "path": str(PROFILE_DIR / name), **entry["data"]}
+
+    @staticmethod
+    def _summary(name: str, entry: dict[str, Any]):
+        app = entry["data"]["app"]
+        return {
+            "name": name,
+            "path": str(PROFILE_DIR / name),
+            "host": host_of(app.get("url")),
+            "modified": entry["stamp"][0] / 1e9 if entry["stamp"] else 0,
+            **entry["data"],
+        }
+
+    def refresh(self):
+        """Reparse changed profiles and drop deleted ones"""
+        with self._lock:
+            if not self._loaded:
+                self._read()
+            seen = set()
+            if PROFILE_DIR.exists():
+                with os.scandir(PROFILE_DIR) as entries:
+                    for item in entries:
+                        if item.is_dir():
+                            seen.add(item.name)
+                            self._entry(item.name)
+            for name in set(self._entries) - seen:
+                del self._entries[name]
+                self._dirty = True
+            self._flush()
+
+    def entries(self):
+        """Return raw catalog entries (stamp and data) by profile name"""
+        self.refresh()
+        with self._lock:
+            return dict(self._entries)
+
+    def profiles(self):
+        """Return every profile, sorted by name"""
+        entries = self.entries()
+        return [self._record(name, entries[name]) for name in sorted(entries)]
+
+    def page(
+        self,
+        offset: int = 0,
+        limit: int = 50,
+        sort: str = "name",
+        fields: Iterable[str] | None = None,
+        reverse: bool = False,
+    ):
+        """Return a sorted slice of profiles with only the requested fields"""
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort}")
+        entries = self.entries()
+        records = [self._summary(name, entry) for name, entry in entries.items()]
+        if sort == "title":
+            records.sort(key=lambda record: (str(record["app"].get("title", "")).lower(), record["name"]))
+        else:
+            records.sort(key=lambda record: (record[sort], record["name"]))
+        if reverse:
+            records.reverse()
+        offset = max(offset, 0)
+        window = records[offset : offset + limit] if limit > 0 else records[offset:]
+        fields = SUMMARY_FIELDS if fields is None else tuple(fields)
+        return {
+            "total": len(records),
+            "offset": offset,
+            "items": [project(record, fields) for record in window],
+        }
+
+    def summary(self, name: str, fields: Iterable[str] | None = None):
+        """Return the projected summary of a single profile"""
+        with self._lock:
+            if not self._loaded:
+                self._read()
+            entry = self._entry(name)
+            self._flush()
+        return project(self._summary(name, entry), SUMMARY_FIELDS if fields is None else fields)
+
+    def get(self, name: str):
+        """Return a single profile"""
+        with self._lock:
+            if not self._loaded:
+                self._read()
+            if not (PROFILE_DIR / name).is_dir():
+                if self._entries.pop(name, None) is not None:
+                    self._dirty = True
+                    self._flush()
+                return {"name": name, "path": str(PROFILE_DIR / name), **Profile.load_return(name)}
+            entry = self._entry(name)
+            self._flush()
+            return self._record(name, entry)
+
+    def invalidate(self, name: str | None = None):
+        """Forget a cached profile, or every profile if name is None"""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+            self._dirty = True
+
+
+CATALOG = Catalog()
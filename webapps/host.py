@@ -0,0 +1,227 @@
+"""Shared host: several profiles as windows of one process"""
+
+import os
+import socket
+import sys
+from hashlib import sha256
+from json import dumps, loads
+from subprocess import DEVNULL, STDOUT, Popen
+from threading import Lock, Thread
+
+from webapps.launcher import prepare, supported, url_error
+from webapps.limits import apply_limits
+from webapps.profiles import CONFIG_DIR, SELF, ensure_dirs
+from webapps.tracing import TRACE_ENV, Trace
+
+HOST_DIR = CONFIG_DIR / "hosts"
+TIMEOUT = 10
+
+
+def host_key(settings: dict, start: dict, limits) -> str:
+    """Key of the host a profile can share.
+
+    webview.settings, the webview.start arguments (storage path and private
+    mode included) and the limits apply to a whole process, so only profiles
+    agreeing on all of them share one; the rest stays apart."""
+    start = dict(start)
+    if start.get("private_mode"):
+        # Nothing is stored in private mode
+        start.pop("storage_path", None)
+    text = dumps([settings, start, limits._asdict()], sort_keys=True, default=str)
+    return sha256(text.encode()).hexdigest()[:16]
+
+
+def key_of(name: str, private: bool = False) -> str | None:
+    """Host key of a profile, None if it can't be opened"""
+    prepared = prepare(name, private)
+    if prepared is None:
+        return None
+    settings, _, start, limits = prepared
+    return host_key(settings, start, limits)
+
+
+def socket_path(key: str):
+    """Where the host of key listens"""
+    return HOST_DIR / f"{key}.sock"
+
+
+def request(key: str, message: dict):
+    """Send a message to the host of key, return its reply or None if it doesn't run"""
+    path = socket_path(key)
+    if not supported() or not path.exists():
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(TIMEOUT)
+    try:
+        client.connect(str(path))
+    except (FileNotFoundError, ConnectionRefusedError):
+        client.close()
+        return None
+    with client, client.makefile("rw", encoding="utf-8") as stream:
+        try:
+            stream.write(dumps(message) + "\n")
+            stream.flush()
+            return loads(stream.readline() or "null")
+        except (OSError, ValueError):
+            return None
+
+
+class Host:
+    """The process hosting every window of one host key"""
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self._windows: dict = {}  # window -> profile name
+        self._lock = Lock()
+        self._server: socket.socket | None = None
+
+    def open(self, name: str, private: bool = False, trace: Trace | None = None) -> str | None:
+        """Open a profile window here, return an error message if it can't be"""
+        import webview  # pylint: disable=import-outside-toplevel
+
+        error = None
+        prepared = prepare(name, private)
+        if prepared is None:
+            error = url_error(name)
+        else:
+            settings, data, start, limits = prepared
+            if host_key(settings, start, limits) != self.key:
+                error = f"{name} doesn't share the settings of this host"
+        if trace is not None:
+            trace.mark("profile")
+            if error:
+                trace.report(error)
+        if error:
+            return error
+        window = webview.create_window(**data)
+        if trace is not None:
+            trace.mark("window")
+            trace.watch(window)
+        with self._lock:
+            self._windows[window] = name
+        window.events.closed += lambda: self._forget(window)
+        return None
+
+    def _forget(self, window):
+        with self._lock:
+            self._windows.pop(window, None)
+
+    def windows(self, name: str) -> int:
+        """How many windows of a profile are open here"""
+        with self._lock:
+            return sum(owner == name for owner in self._windows.values())
+
+    def close(self, name: str) -> int:
+        """Close every window of a profile, return how many there were"""
+        with self._lock:
+            windows = [window for window, owner in self._windows.items() if owner == name]
+        for window in windows:
+            window.destroy()
+        return len(windows)
+
+    def _listen(self) -> bool:
+        if not supported():
+            return False
+        HOST_DIR.mkdir(parents=True, exist_ok=True)
+        path = socket_path(self.key)
+        if request(self.key, {}) is not None:
+            # Another host took this key meanwhile
+            return False
+        path.unlink(missing_ok=True)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(str(path))
+        os.chmod(path, 0o600)
+        self._server.listen()
+        Thread(target=self._serve, name="host", daemon=True).start()
+        return True
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            with conn, conn.makefile("rw", encoding="utf-8") as stream:
+                conn.settimeout(TIMEOUT)
+                try:
+                    message = loads(stream.readline() or "{}")
+                    if message.get("close"):
+                        reply = {"closed": self.close(message["close"])}
+                    elif message.get("windows"):
+                        reply = {"windows": self.windows(message["windows"])}
+                    elif message.get("name"):
+                        trace = Trace(message["trace"]) if message.get("trace") else None
+                        error = self.open(message["name"], message.get("private", False), trace)
+                        reply = {"error": error}
+                    else:
+                        reply = {}
+                    reply["pid"] = os.getpid()
+                    stream.write(dumps(reply) + "\n")
+                    stream.flush()
+                except (OSError, ValueError):
+                    continue
+
+    def run(self, names: list[str], private: bool = False, trace: Trace | None = None):
+        """Open names here, then serve further launches until every window is closed.
+
+        trace, if given, follows the first of names."""
+        import webview  # pylint: disable=import-outside-toplevel
+
+        if trace is not None:
+            trace.mark("imports")
+        settings, _, start, limits = prepare(names[0], private)
+        apply_limits(limits)
+        webview.settings = settings
+        for index, name in enumerate(names):
+            error = self.open(name, private, None if index else trace)
+            if error:
+                print(error)
+        listening = self._listen()
+        try:
+            webview.start(**start)
+        finally:
+            if listening:
+                self._server.close()
+                socket_path(self.key).unlink(missing_ok=True)
+
+
+def spawn(names: list[str], private: bool = False, trace: dict | None = None) -> Popen:
+    """Start a host process for names, which must share one host key"""
+    command = [sys.executable, str(SELF), "run", "--shared", *names]
+    if private:
+        command.insert(3, "--private")
+    env = None if trace is None else {**os.environ, TRACE_ENV: dumps(trace)}
+    # pylint: disable=consider-using-with
+    return Popen(command, start_new_session=True, stdout=DEVNULL, stderr=STDOUT, env=env)
+
+
+def run_shared(names: list[str], private: bool = False, dry_run: bool = False,
+               trace: Trace | None = None):
+    """Open profiles in shared hosts, attaching to running ones.
+
+    Profiles that can't share a host with the first one get a host process
+    of their own; the first group is hosted in this process. trace, if
+    given, follows this process when it hosts the first of names."""
+    ensure_dirs()
+    groups: dict[str, list[str]] = {}
+    for name in names:
+        key = key_of(name, private)
+        if key is None:
+            print(url_error(name))
+            continue
+        if dry_run:
+            print(f"{name}: host {key}")
+            continue
+        reply = request(key, {"name": name, "private": private})
+        if reply is None:
+            groups.setdefault(key, []).append(name)
+        elif reply.get("error"):
+            print(reply["error"])
+    if not groups:
+        return
+    first, *others = groups
+    for key in others:
+        spawn(groups[key], private)
+    if trace is not None and groups[first][0] != trace.profile:
+        trace = None
+    Host(first).run(groups[first], private, trace)
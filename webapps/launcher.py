@@ -0,0 +1,176 @@
+"""Pre-forked profile launcher"""
+
+import os
+import signal
+import socket
+import sys
+from json import dumps, loads
+
+from webapps.limits import apply_limits
+from webapps.profiles import CONFIG_DIR, PROFILE_DIR, Profile, annihilate_defconst, ensure_dirs
+from webapps.tracing import Trace
+
+SOCKET_PATH = CONFIG_DIR / "launcher.sock"
+TIMEOUT = 10
+
+
+def supported():
+    """Whether this platform can run the launcher daemon"""
+    return hasattr(socket, "AF_UNIX") and hasattr(os, "fork")
+
+
+def prepare(name: str, private: bool = False):
+    """Load a profile into webview settings, create_window and start arguments, and its limits"""
+    profile = Profile.load(name)
+    if profile.data.url in (None, ""):
+        return None
+    data = annihilate_defconst(profile.data._asdict())
+    start = annihilate_defconst(profile.start_data._asdict())
+    settings = annihilate_defconst(profile.common_config._asdict())
+    if private:
+        data["title"] += " (Private Mode)"
+        start["private_mode"] = True
+    return settings, data, start, profile.limits
+
+
+def url_error(name: str):
+    """Message for a profile that has no URL to open"""
+    return f"Please change URL entry for {name} at {PROFILE_DIR / name / 'config.conf'}"
+
+
+def launch(name: str, private: bool = False, dry_run: bool = False, report=None,
+           trace: Trace | None = None):
+    """Open a profile window in this process.
+
+    report, if given, is called with an error message (or None) right before
+    the window is created. On dry runs, the window is never created. The
+    profile limits are applied to this process, and so to the browser it starts.
+    trace, if given, is stamped along the way and sent once the window shows."""
+    import webview  # pylint: disable=import-outside-toplevel
+
+    if trace is not None:
+        trace.mark("imports")
+    prepared = prepare(name, private)
+    error = None if prepared else url_error(name)
+    if report is not None:
+        report(error)
+    elif error:
+        print(error)
+    if trace is not None:
+        trace.mark("profile")
+        if error or dry_run:
+            trace.report(error)
+    if error or dry_run:
+        return
+    settings, data, start, limits = prepared
+    apply_limits(limits)
+    webview.settings = settings
+    window = webview.create_window(**data)
+    if trace is not None:
+        trace.mark("window")
+        trace.watch(window)
+    webview.start(**start)
+
+
+def request(name: str, private: bool = False, dry_run: bool = False, wait: bool = True,
+            trace: dict | None = None):
+    """Ask the launcher daemon to open a profile, traced if given a trace context.
+
+    Returns the reply of the daemon ({"pid": ...}, plus "error" when waited
+    for and the profile can't be opened), or None if no daemon is running."""
+    if not supported() or not SOCKET_PATH.exists():
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(TIMEOUT)
+    try:
+        client.connect(str(SOCKET_PATH))
+    except (FileNotFoundError, ConnectionRefusedError):
+        client.close()
+        return None
+    with client, client.makefile("rw", encoding="utf-8") as stream:
+        message = {"name": name, "private": private, "dry_run": dry_run}
+        if trace is not None:
+            message["trace"] = trace
+        stream.write(dumps(message) + "\n")
+        stream.flush()
+        reply: dict = {}
+        # The child may report before the daemon sends its pid, read until both are in.
+        try:
+            for line in stream:
+                reply.update(loads(line))
+                if "pid" in reply and (not wait or "ready" in reply):
+                    break
+        except (OSError, ValueError):
+            if "pid" not in reply:
+                return None
+    return reply
+
+
+def _child(server: socket.socket, conn: socket.socket, message: dict):
+    server.close()
+    os.setsid()
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    def report(error):
+        try:
+            conn.sendall((dumps({"ready": error is None, "error": error}) + "\n").encode())
+        except OSError:
+            pass
+        conn.close()
+
+    # The interpreter and imports are the daemon's: both were ready when forked
+    trace = Trace(message["trace"]) if message.get("trace") else None
+    if trace is not None:
+        trace.mark("interpreter")
+    try:
+        launch(
+            message["name"],
+            message.get("private", False),
+            message.get("dry_run", False),
+            report,
+            trace,
+        )
+    finally:
+        os._exit(0)  # pylint: disable=protected-access
+
+
+def serve():
+    """Run the launcher daemon in this process"""
+    # Everything a launched profile needs is imported once, here.
+    import webview  # pylint: disable=import-outside-toplevel,unused-import
+
+    if request("", dry_run=True, wait=False) is not None:
+        print(f"Launcher is already running at {SOCKET_PATH}")
+        return
+    ensure_dirs()
+    SOCKET_PATH.unlink(missing_ok=True)
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(SOCKET_PATH))
+    os.chmod(SOCKET_PATH, 0o600)
+    server.listen()
+    print(f"Launcher is listening at {SOCKET_PATH}")
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                conn.settimeout(TIMEOUT)
+                try:
+                    with conn.makefile("r", encoding="utf-8") as stream:
+                        message = loads(stream.readline() or "{}")
+                except (OSError, ValueError):
+                    continue
+                if not message.get("name"):
+                    conn.sendall(b"{}\n")
+                    continue
+                pid = os.fork()
+                if pid == 0:
+                    _child(server, conn, message)
+                conn.sendall((dumps({"pid": pid}) + "\n").encode())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        SOCKET_PATH.unlink(missing_ok=True)
@@ -0,0 +1,88 @@
+"""Resource limits and scheduling priority of launched profiles"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import platform
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MIB = 1 << 20
+# ioprio_set(2) has no libc wrapper, and its number depends on the architecture
+IOPRIO_SET = {
+    "x86_64": 251,
+    "i386": 289,
+    "i686": 289,
+    "aarch64": 30,
+    "riscv64": 30,
+    "armv7l": 314,
+    "ppc64le": 273,
+    "s390x": 282,
+}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_SHIFT = 13
+IO_CLASSES = {"realtime": 1, "best-effort": 2, "idle": 3}
+
+
+def parse_cpus(text: str) -> set[int]:
+    """Parse a CPU list like taskset's, e.g. "0-3,6", raise ValueError if malformed"""
+    cpus: set[int] = set()
+    for part in text.split(","):
+        first, _, last = part.strip().partition("-")
+        start = int(first)
+        stop = int(last) if last else start
+        if start < 0 or stop < start:
+            raise ValueError(f"Invalid CPU range {part!r}")
+        cpus.update(range(start, stop + 1))
+    return cpus
+
+
+def _ioprio_set(io_class: str, level: int):
+    number = IOPRIO_SET.get(platform.machine())
+    if number is None or not platform.system() == "Linux":
+        raise OSError(f"I/O priority isn't supported on {platform.system()} {platform.machine()}")
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    value = IO_CLASSES[io_class] << IOPRIO_CLASS_SHIFT | level
+    if libc.syscall(number, IOPRIO_WHO_PROCESS, 0, value) < 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+
+
+def _set_rlimit(kind: int, mib: int):
+    limit = mib * MIB
+    _, hard = resource.getrlimit(kind)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(kind, (limit, limit))
+
+
+def apply_limits(limits) -> list[str]:
+    """Apply a profiles.Limits to this process, which its children inherit.
+
+    Each limit is applied on its own; those the platform or our privileges
+    don't allow are logged and returned as messages."""
+    steps = []
+    if limits.memory:
+        steps.append(("memory", lambda: _set_rlimit(resource.RLIMIT_DATA, limits.memory)))
+    if limits.address_space:
+        space = limits.address_space
+        steps.append(("address space", lambda: _set_rlimit(resource.RLIMIT_AS, space)))
+    if limits.nice is not None:
+        steps.append(("nice", lambda: os.setpriority(os.PRIO_PROCESS, 0, limits.nice)))
+    if limits.io_class:
+        steps.append(("I/O priority", lambda: _ioprio_set(limits.io_class, limits.io_level or 0)))
+    if limits.cpus:
+        steps.append(("CPU affinity", lambda: os.sched_setaffinity(0, parse_cpus(limits.cpus))))
+    failures = []
+    for what, step in steps:
+        try:
+            step()
+        except (AttributeError, OSError, ValueError) as error:
+            # AttributeError: the platform lacks resource, setpriority or sched_setaffinity
+            failures.append(f"Can't set {what}: {error}")
+            logging.warning(failures[-1])
+    return failures
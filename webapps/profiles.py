@@ -3,13 +3,20 @@
 from urllib.parse import urlparse
 from pathlib import Path
 from platform import system
-from configparser import ConfigParser
-from typing import NamedTuple, Callable, Any
+from ast import literal_eval
+from configparser import ConfigParser, Error as ConfigError
+from contextlib import contextmanager
+from hashlib import sha256
+from json import dumps, loads
+from threading import local
+from types import NoneType, UnionType
+from typing import NamedTuple, Callable, Any, Hashable, Iterable, Union, get_args, get_origin
 from io import StringIO
 from sys import exit  # pylint: disable=redefined-builtin
 import os
 
-from webapps.validation import Validation
+from webapps.limits import IO_CLASSES, parse_cpus
+from webapps.validation import Rule, ValidateEntry, Validation, Validator
 
 APP_BAT_TEMPLATE = """\
 @echo off
@@ -39,11 +46,6 @@ PROFILE_DIR = CONFIG_DIR / "profiles"
 # _PROFILE.read(CONFIG_FILE)
 SELF = Path(__file__).parent.parent / "main.py"
 
-if not CONFIG_DIR.exists():
-    CONFIG_DIR.mkdir()
-    # CONFIG_FILE.touch()
-    PROFILE_DIR.mkdir()
-
 OptStr = str | None
 OptInt = int | None
 default = object()
@@ -51,6 +53,84 @@ _DELOBJS_CW = ["js_api", "server", "server_args", "localization"]
 _DELOBJS_S = ["func", "server", "server_args", "menu"]
 _STR_DEFKEY = "py:default"
 _DELOBJS_API = ["html", "http_server", "http_port", "storage_path", "ssl", "args"]
+_FALSY = ("no", "false", "0")
+_TRUTHY = ("yes", "true", "1")
+
+def ensure_dirs():
+    """Create config and profile directories, if missing"""
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+
+# path -> ((mtime_ns, size), sha256) of what was last seen on disk
+_DIGESTS: dict[str, tuple[tuple[int, int], bytes]] = {}
+_BATCH = local()
+# Private temporary files, created with the umask applied
+_TEMP_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+
+def write_if_changed(path: Path, text: str) -> bool:
+    """Atomically replace path with text, unless it already holds it. Return whether it was written"""
+    path = os.fspath(path)
+    data = text.replace("\n", os.linesep).encode("utf-8")
+    digest = sha256(data).digest()
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        stat = None
+    if stat is not None and stat.st_size == len(data):
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        known = _DIGESTS.get(path)
+        if known is None or known[0] != stamp:
+            with open(path, "rb") as file:
+                known = _DIGESTS[path] = (stamp, sha256(file.read()).digest())
+        if known[1] == digest:
+            return False
+    # A temporary file of our own, so concurrent saves never write into one another's
+    directory, name = os.path.split(path)
+    temp = os.path.join(directory, f".{name}.{os.urandom(8).hex()}.tmp")
+    descriptor = os.open(temp, _TEMP_FLAGS, 0o666)
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        if stat is not None:
+            os.chmod(temp, stat.st_mode)
+        os.replace(temp, path)
+    except BaseException:
+        try:
+            os.unlink(temp)
+        except FileNotFoundError:
+            pass
+        raise
+    stat = os.stat(path)
+    _DIGESTS[path] = ((stat.st_mtime_ns, stat.st_size), digest)
+    return True
+
+@contextmanager
+def batch_saves():
+    """Defer Profile.save writes of this thread until the outermost batch exits.
+
+    Several saves of one profile are coalesced into a single write. If the
+    batch raises, nothing it saved is written."""
+    if getattr(_BATCH, "pending", None) is not None:
+        yield
+        return
+    _BATCH.pending = {}
+    try:
+        yield
+        pending = _BATCH.pending
+    finally:
+        _BATCH.pending = None
+    for path, text in pending.items():
+        if write_if_changed(path, text) and path.endswith((".sh", ".bat")):
+            print(f"App shell is created at: {path}")
+
+def _write(path: Path, text: str) -> bool:
+    """Write now, or queue the write when inside batch_saves"""
+    pending = getattr(_BATCH, "pending", None)
+    if pending is None:
+        return write_if_changed(path, text)
+    pending[os.fspath(path)] = text
+    return False
 
 def check(name):
     if '/' in name:
@@ -87,55 +167,9 @@ class CWConfig(NamedTuple):
     server_args: dict | Any = default
     localization: dict | None = None
 
-    def validate(self):
+    def validate(self, changed: set[str] | None = None, key: Hashable | None = None):
         """Validate create-window configs"""
-        vl = Validation()
-        vl.set(isinstance(self.title, str), "app/title", "Title is not a string")
-        r = urlparse(self.url)
-        vl.set(
-            all((r.scheme, r.netloc)) and self.html is None,
-            "app/url",
-            "URL is malformed",
-        )
-        # HTML is optional
-        vl.set(isinstance(self.width, int), "app/width", "the width is not an integer")
-        vl.set(
-            isinstance(self.height, int),
-            "app/height",
-            "the height is not an integer",
-        )
-        vl.set(self.width > 0, "app/width", "width must not less than 0")
-        vl.set(self.height > 0, "app/height", "height must not less than 0")
-        # X, Y is optional
-        vl.set(
-            all(
-                map(
-                    lambda stuff: isinstance(stuff, bool),
-                    (
-                        self.resizable,
-                        self.fullscreen,
-                        self.hidden,
-                        self.frameless,
-                        self.easy_drag,
-                        self.minimized,
-                        self.on_top,
-                        self.confirm_close,
-                        self.transparent,
-                        self.text_select,
-                        self.zoomable,
-                        self.draggable,
-                    ),
-                )
-            ),
-            "app/bools",
-            "A value is detected to be non-boolean",
-        )
-        vl.set(
-            self.background_color[0] == "#" and len(self.background_color) == 7,
-            "app/background_color",
-            "Color format is invalid",
-        )
-        return vl
+        return CW_VALIDATOR.validate(self, changed, key)
 
 
 class StartConfig(NamedTuple):
@@ -156,20 +190,9 @@ class StartConfig(NamedTuple):
     ssl: bool = False
     server_args: dict | Any = default
 
-    def validate(self):
+    def validate(self, changed: set[str] | None = None, key: Hashable | None = None):
         """Validate start config"""
-        vl = Validation()
-        vl.set(
-            all(
-                map(
-                    lambda stuff: isinstance(stuff, bool),
-                    (self.debug, self.private_mode),
-                )
-            ),
-            "start/any",
-            "Either debug/private mode is not boolean",
-        )
-        return vl
+        return START_VALIDATOR.validate(self, changed, key)
 
 
 class WebviewSetting(NamedTuple):
@@ -180,9 +203,122 @@ class WebviewSetting(NamedTuple):
     ALLOW_EXTERNAL_LINKS_IN_BROWSER: bool = True
     OPEN_DEVTOOL_IN_DEBUG: bool = True
 
-    def validate(self):
+    def validate(self, changed: set[str] | None = None, key: Hashable | None = None):
         """Webview config validator"""
-        assert all(map(lambda stuff: isinstance(stuff, bool), self))
+        return SETTING_VALIDATOR.validate(self, changed, key)
+
+
+class Limits(NamedTuple):
+    """Resource limits and scheduling priority of the launched app, None means unlimited"""
+
+    memory: OptInt = None  # MiB of data segment (RLIMIT_DATA)
+    address_space: OptInt = None  # MiB of virtual memory (RLIMIT_AS)
+    nice: OptInt = None  # -20 (favoured) to 19
+    io_class: OptStr = None  # realtime, best-effort or idle
+    io_level: OptInt = None  # 0 (favoured) to 7, within io_class
+    cpus: OptStr = None  # CPU list like taskset's, e.g. "0-3,6"
+
+    def validate(self, changed: set[str] | None = None, key: Hashable | None = None):
+        """Validate resource limits"""
+        return LIMITS_VALIDATOR.validate(self, changed, key)
+
+
+def _is_bools(*values):
+    return all(isinstance(value, bool) for value in values)
+
+
+def _valid_url(url, html):
+    parsed = urlparse(url)
+    return all((parsed.scheme, parsed.netloc)) and html is None
+
+
+def _in_range(low: int, high: int):
+    return lambda value: value is None or isinstance(value, int) and low <= value <= high
+
+
+def _valid_cpus(cpus):
+    if not cpus:
+        return True
+    try:
+        return isinstance(cpus, str) and bool(parse_cpus(cpus))
+    except ValueError:
+        return False
+
+
+def _bool_fields(kind: type):
+    return tuple(key for key, annotation in kind.__annotations__.items() if annotation is bool)
+
+
+CW_RULES = (
+    Rule(("title",), lambda title: isinstance(title, str), "app/title", "Title is not a string"),
+    # HTML is optional
+    Rule(("url", "html"), _valid_url, "app/url", "URL is malformed"),
+    Rule(("width",), lambda width: isinstance(width, int), "app/width", "the width is not an integer"),
+    Rule(
+        ("height",),
+        lambda height: isinstance(height, int),
+        "app/height",
+        "the height is not an integer",
+    ),
+    Rule(
+        ("width",),
+        lambda width: not isinstance(width, int) or width > 0,
+        "app/width",
+        "width must not less than 0",
+    ),
+    Rule(
+        ("height",),
+        lambda height: not isinstance(height, int) or height > 0,
+        "app/height",
+        "height must not less than 0",
+    ),
+    # X, Y is optional
+    Rule(_bool_fields(CWConfig), _is_bools, "app/bools", "A value is detected to be non-boolean"),
+    Rule(
+        ("background_color",),
+        lambda color: isinstance(color, str) and len(color) == 7 and color[0] == "#",
+        "app/background_color",
+        "Color format is invalid",
+    ),
+)
+START_RULES = (
+    Rule(("debug", "private_mode"), _is_bools, "start/any", "Either debug/private mode is not boolean"),
+)
+SETTING_RULES = (
+    Rule(WebviewSetting._fields, _is_bools, "config/bools", "A value is detected to be non-boolean"),
+)
+LIMITS_RULES = (
+    Rule(
+        ("memory",),
+        _in_range(1, 1 << 40),
+        "limits/memory",
+        "Memory limit must be a positive number of MiB",
+    ),
+    Rule(
+        ("address_space",),
+        _in_range(1, 1 << 40),
+        "limits/address_space",
+        "Address space limit must be a positive number of MiB",
+    ),
+    Rule(("nice",), _in_range(-20, 19), "limits/nice", "Nice level must be between -20 and 19"),
+    Rule(
+        ("io_class",),
+        lambda io_class: not io_class or io_class in IO_CLASSES,
+        "limits/io_class",
+        "I/O class must be realtime, best-effort or idle",
+    ),
+    Rule(
+        ("io_level",),
+        _in_range(0, 7),
+        "limits/io_level",
+        "I/O priority must be between 0 and 7",
+    ),
+    Rule(("cpus",), _valid_cpus, "limits/cpus", "CPU list is malformed, e.g. 0-3,6"),
+)
+CW_VALIDATOR = Validator(CWConfig, CW_RULES)
+START_VALIDATOR = Validator(StartConfig, START_RULES)
+SETTING_VALIDATOR = Validator(WebviewSetting, SETTING_RULES)
+LIMITS_VALIDATOR = Validator(Limits, LIMITS_RULES)
 
 
 def replace_default(ns: dict[str, Any], with_: Any):
@@ -215,34 +351,180 @@ def _dstring(ns: dict[Any, Any]):
             exit(1)
 
 
-def _dset(profile: ConfigParser, section: str, ns: dict[str, Any]):
-    for k, v in ns.items():
-        # print(f"[{section} {type(section)}] {k!r} -> {v!r}")
-        if v in (None, False):
-            profile.set(section, k, "no")
-            continue
-        if v is True:
-            profile.set(section, k, "yes")
-            continue
-        profile.set(section, k, str(v))
+def _members(annotation) -> tuple[Any, ...]:
+    if get_origin(annotation) in (Union, UnionType):
+        return get_args(annotation)
+    return (annotation,)
 
 
-def _dump(profile: ConfigParser, section: str):
-    data = {}
-    for k, v in profile[section].items():
-        if v in ("no", "false", "0"):
-            data[k] = False
-            continue
-        if v in ("yes", "true", "1"):
-            data[k] = True
-            continue
-        if v.isnumeric():
-            data[k] = int(v)
-            continue
-        if v == _STR_DEFKEY:
-            continue
-        data[k] = v
-    return data
+def _decode_bool(value: str):
+    lowered = value.lower()
+    if lowered in _FALSY:
+        return False
+    if lowered in _TRUTHY:
+        return True
+    return value
+
+
+def _decode_int(value: str):
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def _decode_optint(value: str):
+    # "0" is a number here, x=0 is the left edge of the screen
+    if value.lower() in ("no", "false"):
+        return None
+    return _decode_int(value)
+
+
+def _decode_optstr(value: str):
+    if value == "no":
+        return None
+    return value
+
+
+def _decode_dict(value: str):
+    if value.lower() in _FALSY:
+        return None
+    try:
+        return loads(value)
+    except ValueError:
+        # Written as a Python repr by older versions
+        try:
+            return literal_eval(value)
+        except (ValueError, SyntaxError):
+            return value
+
+
+def _decode_any(value: str):
+    if value in ("no", "false", "0"):
+        return False
+    if value in ("yes", "true", "1"):
+        return True
+    if value.isnumeric():
+        return int(value)
+    return value
+
+
+def _decode_optany(value: str):
+    if value == "no":
+        return None
+    return _decode_any(value)
+
+
+def _encode_value(value: Any):
+    if value is default:
+        return _STR_DEFKEY
+    # Not `in (None, False)`: 0 == False, and 0 must stay a number
+    if value is None or value is False:
+        return "no"
+    if value is True:
+        return "yes"
+    return str(value)
+
+
+def _encode_dict(value: Any):
+    if isinstance(value, dict):
+        return dumps(value)
+    return _encode_value(value)
+
+
+def _field_codec(annotation) -> tuple[Callable[[str], Any], Callable[[Any], str]]:
+    """Return (decoder, encoder) of a field, picked from its annotation"""
+    members = set(_members(annotation))
+    optional = NoneType in members
+    members.discard(NoneType)
+    if members == {bool}:
+        return _decode_bool, _encode_value
+    if members == {int}:
+        return (_decode_optint if optional else _decode_int), _encode_value
+    if members == {str}:
+        return (_decode_optstr if optional else str), _encode_value
+    if dict in members:
+        return _decode_dict, _encode_dict
+    return (_decode_optany if optional else _decode_any), _encode_value
+
+
+class Codec:
+    """ConfigParser section codec of a NamedTuple, compiled once from its annotations"""
+
+    def __init__(self, kind: type, skip: tuple[str, ...] = ()) -> None:
+        self._kind = kind
+        self._decoders: dict[str, tuple[str, Callable[[str], Any]]] = {}
+        self._encoders: list[tuple[int, str, Callable[[Any], str]]] = []
+        for index, (field, annotation) in enumerate(kind.__annotations__.items()):
+            decoder, encoder = _field_codec(annotation)
+            # ConfigParser lowercases option names
+            self._decoders[field.lower()] = (field, decoder)
+            if field not in skip:
+                self._encoders.append((index, field, encoder))
+        self._writable = frozenset(field for _, field, _ in self._encoders)
+        hidden = {*_DELOBJS_CW, *_DELOBJS_S}
+        self._public = [
+            (index, field)
+            for index, field in enumerate(kind._fields)
+            if field not in hidden
+        ]
+        self._public_api = [
+            (index, field) for index, field in self._public if field not in _DELOBJS_API
+        ]
+
+    def decode(self, section: Iterable[tuple[str, str]]):
+        """Build the NamedTuple from (option, value) pairs, ignoring unknown options"""
+        values = {}
+        for key, raw in section:
+            if raw == _STR_DEFKEY:
+                continue
+            field = self._decoders.get(key)
+            if field is not None:
+                values[field[0]] = field[1](raw)
+        return self._kind(**values)
+
+    @property
+    def fields(self):
+        """Names of the fields written to the config file"""
+        return self._writable
+
+    def default(self, field: str):
+        """Default value of a field, None if it has none"""
+        return self._kind._field_defaults.get(field)
+
+    def encode(self, data: tuple) -> dict[str, str]:
+        """Return the option values of a NamedTuple"""
+        return {field: encoder(data[index]) for index, field, encoder in self._encoders}
+
+    def encode_fields(self, data: tuple, fields: Iterable[str]) -> dict[str, str]:
+        """Return the option values of some fields of a NamedTuple"""
+        fields = set(fields)
+        return {
+            field: encoder(data[index])
+            for index, field, encoder in self._encoders
+            if field in fields
+        }
+
+    def to_dict(self, data: tuple, to_api: bool = False) -> dict[str, Any]:
+        """Same as annihilate_defconst(data._asdict(), to_api), without the intermediate dicts"""
+        return {
+            field: data[index]
+            for index, field in (self._public_api if to_api else self._public)
+            if data[index] is not default and data[index] != _STR_DEFKEY
+        }
+
+
+CW_CODEC = Codec(CWConfig, tuple(_DELOBJS_CW))
+START_CODEC = Codec(StartConfig, tuple(_DELOBJS_S))
+SETTING_CODEC = Codec(WebviewSetting)
+LIMITS_CODEC = Codec(Limits)
+# API key -> (Profile attribute, codec, validator, config section suffix)
+_SECTIONS = {
+    "app": ("_data", CW_CODEC, CW_VALIDATOR, ""),
+    "start": ("_start_data", START_CODEC, START_VALIDATOR, ".start"),
+    "config": ("common_config", SETTING_CODEC, SETTING_VALIDATOR, ".common"),
+    "limits": ("limits", LIMITS_CODEC, LIMITS_VALIDATOR, ".limits"),
+}
 
 
 class Profile:
@@ -258,6 +540,7 @@ class Profile:
         self._name = name
         self._start_data = StartConfig(private_mode=False, storage_path=str(self._dir))
         self.common_config = WebviewSetting()
+        self.limits = Limits()
         # self._dir.mkdir(exist_ok=True)
         self._profile = ConfigParser(interpolation=None)
 
@@ -283,53 +566,70 @@ class Profile:
         """Return data used for starting webapps"""
         return self._start_data
 
+    def _app_script(self):
+        template = APP_BAT_TEMPLATE if os.name == "nt" else APP_SH_TEMPLATE
+        return template.format(dir=SELF.parent, self=str(SELF), name=self._name)
+
     def save(self):
-        """Save data to config file"""
+        """Save data to config file, skipping files whose content is unchanged"""
+        ensure_dirs()
         self._dir.mkdir(exist_ok=True)
         name = self._name
         app = self._custom_exec
+        self._profile.read_dict(
+            {
+                name: CW_CODEC.encode(self._data),
+                f"{name}.start": START_CODEC.encode(self._start_data),
+                f"{name}.common": SETTING_CODEC.encode(self.common_config),
+                f"{name}.limits": LIMITS_CODEC.encode(self.limits),
+            }
+        )
+        self._write_config()
+        if _write(app, self._app_script()):
+            print(f"App shell is created at: {app}")
+
+    def _write_config(self):
         sio = StringIO()
         sio.write("# This file is generated by Webapp\n")
-        parsed_data = self._data._asdict()
-        parsed_sdata = self._start_data._asdict()
-        parsed_wvdata = self.common_config._asdict()
-        for i in _DELOBJS_CW:
-            del parsed_data[i]
-
-        for i in _DELOBJS_S:
-            del parsed_sdata[i]
-
-        rd_parsed = replace_default(parsed_data, _STR_DEFKEY)
-        rd_sparsed = replace_default(parsed_sdata, _STR_DEFKEY)
-        rd_wvparsed = replace_default(parsed_wvdata, _STR_DEFKEY)
-        # print(rd_parsed, '\n', rd_sparsed)
-        if not self._profile.has_section(name):
-            self._profile.add_section(name)
-            self._profile.add_section(f"{name}.start")
-            self._profile.add_section(f"{name}.common")
-        # _dstring(rd_parsed)
-        # _dstring(rd_sparsed)
-        # _PROFILE[name] = rd_parsed
-        # _PROFILE[f"{name}.start"] = rd_sparsed
-        _dset(self._profile, name, rd_parsed)
-        _dset(self._profile, f"{name}.start", rd_sparsed)
-        _dset(self._profile, f"{name}.common", rd_wvparsed)
         self._profile.write(sio)
-        with open(self._config, "w", encoding="utf-8") as config:
-            config.write(sio.getvalue())
-
-        if os.name == "nt":
-            with open(app, "w", encoding="UTF-8") as batfile:
-                batfile.write(
-                    APP_BAT_TEMPLATE.format(dir=SELF.parent, self=str(SELF), name=name)
-                )
-        else:
-            with open(app, "w", encoding="UTF-8") as shellfile:
-                shellfile.write(
-                    APP_SH_TEMPLATE.format(dir=SELF.parent, self=str(self), name=name)
-                )
-        # CONFIG_FILE.write_text(sio.getvalue())
-        print(f"App shell is created at: {app}")
+        _write(self._config, sio.getvalue())
+
+    def patch(self, changes: dict[str, dict[str, Any]]):
+        """Apply a JSON merge patch of app/start/config fields, then save the touched sections.
+
+        A null value resets a field to its default. Only the rules depending on a
+        changed field are checked, and nothing is written if any of them fails."""
+        vl = Validation()
+        updated = {}
+        for key, fields in changes.items():
+            if key not in _SECTIONS:
+                vl.set(False, key, "Unknown section")
+                continue
+            attribute, codec, validator, _ = _SECTIONS[key]
+            unknown = set(fields) - codec.fields
+            for field in sorted(unknown):
+                vl.set(False, f"{key}/{field}", "Unknown option")
+            if unknown or not fields:
+                continue
+            data = getattr(self, attribute)._replace(
+                **{
+                    field: codec.default(field) if value is None else value
+                    for field, value in fields.items()
+                }
+            )
+            vl.extend(validator.validate(data, set(fields)))
+            updated[key] = data
+        errors = vl.to_json()
+        if errors or not updated:
+            return errors
+        for key, data in updated.items():
+            attribute, codec, _, suffix = _SECTIONS[key]
+            setattr(self, attribute, data)
+            self._profile.read_dict(
+                {f"{self._name}{suffix}": codec.encode_fields(data, changes[key])}
+            )
+        self._write_config()
+        return []
 
     @classmethod
     def load(cls, name: str):
@@ -338,14 +638,12 @@ class Profile:
         if self._config.exists():
             profile = ConfigParser(interpolation=None)
             profile.read(self._config)
-            self._data = CWConfig(**_dump(profile, name))
-            self._start_data = StartConfig(**_dump(profile, f"{name}.start"))
-            self.common_config = WebviewSetting(
-                **{
-                    key.upper(): value
-                    for key, value in _dump(profile, f"{name}.common").items()
-                }
-            )
+            self._data = CW_CODEC.decode(profile.items(name, raw=True))
+            self._start_data = START_CODEC.decode(profile.items(f"{name}.start", raw=True))
+            self.common_config = SETTING_CODEC.decode(profile.items(f"{name}.common", raw=True))
+            # Profiles saved before limits existed have no such section
+            if profile.has_section(f"{name}.limits"):
+                self.limits = LIMITS_CODEC.decode(profile.items(f"{name}.limits", raw=True))
             self._profile = profile
         return self
 
@@ -358,31 +656,23 @@ class Profile:
     def to_dict(self):
         """Return the instance into JSON-able"""
         return {
-            "app": annihilate_defconst(self.data._asdict(), True),
-            "start": annihilate_defconst(self.start_data._asdict(), True),
-            "config": annihilate_defconst(self.common_config._asdict(), True),
+            "app": CW_CODEC.to_dict(self.data, True),
+            "start": START_CODEC.to_dict(self.start_data, True),
+            "config": SETTING_CODEC.to_dict(self.common_config, True),
+            "limits": LIMITS_CODEC.to_dict(self.limits, True),
         }
 
     def load_missing(self):
         """Load missing app name"""
-        app = self._custom_exec
-        name = self._name
-        if app.exists():
+        if self._custom_exec.exists():
             return
-        if os.name == "nt":
-            with open(app, "w", encoding="UTF-8") as batfile:
-                batfile.write(
-                    APP_BAT_TEMPLATE.format(dir=SELF.parent, self=str(SELF), name=name)
-                )
-        else:
-            with open(app, "w", encoding="UTF-8") as shellfile:
-                shellfile.write(
-                    APP_SH_TEMPLATE.format(dir=SELF.parent, self=str(self), name=name)
-                )
+        _write(self._custom_exec, self._app_script())
         print(f"Refreshed {self._name}")
 
-    def validate(self):
-        """Validate this profile"""
+    def validate(self, key: Hashable | None = None):
+        """Validate this profile.
+
+        With a key, only fields changed since the last validation under that key are checked again."""
         vl = Validation()
         # vl.set(False, "name", "test :3")
         vl.set(
@@ -391,10 +681,30 @@ class Profile:
             "Profile name contains illegal character",
         )
         vl.set(len(self._name) > 0, "name", "Profile name must not be empty")
-        vl1 = self.data.validate()
-        vl2 = self.start_data.validate()
-        self.common_config.validate()
-        a0 = vl.to_json()
-        a0.extend(vl1.to_json())
-        a0.extend(vl2.to_json())
-        return a0
+        vl.extend(self.data.validate(key=key))
+        vl.extend(self.start_data.validate(key=key))
+        vl.extend(self.common_config.validate(key=key))
+        vl.extend(self.limits.validate(key=key))
+        return vl.to_json()
+
+
+def validate_profiles(names: Iterable[str] | None = None) -> dict[str, list[dict[str, Any]]]:
+    """Validate every profile on disk (or only names), return the failures by profile name"""
+    if names is None:
+        try:
+            names = sorted(entry.name for entry in os.scandir(PROFILE_DIR) if entry.is_dir())
+        except FileNotFoundError:
+            return {}
+    failures = {}
+    for name in names:
+        profile = Profile(name, None)
+        if not profile._config.exists():  # pylint: disable=protected-access
+            errors = [ValidateEntry(False, "file", "config.conf is missing")._asdict()]
+        else:
+            try:
+                errors = Profile.load(name).validate()
+            except (ConfigError, TypeError, ValueError) as error:
+                errors = [ValidateEntry(False, "file", f"config.conf can't be read: {error}")._asdict()]
+        if errors:
+            failures[name] = errors
+    return failures
@@ -0,0 +1,163 @@
+"""Profile search index"""
+
+from bisect import bisect_left
+from threading import RLock
+from typing import Any
+
+from webapps.catalog import CATALOG, host_of
+from webapps.profiles import CWConfig, StartConfig
+
+FLAGS = tuple(
+    key
+    for config in (CWConfig, StartConfig)
+    for key, kind in config.__annotations__.items()
+    if kind is bool
+)
+
+
+def _grams(text: str):
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class _TextIndex:
+    """Prefix (sorted keys) and substring (trigram) lookup over one text field"""
+
+    def __init__(self) -> None:
+        self._text: dict[str, str] = {}
+        self._sorted: list[tuple[str, str]] = []
+        self._grams: dict[str, set[str]] = {}
+
+    def add(self, name: str, text: str):
+        """Index text of a profile"""
+        text = text.lower()
+        self._text[name] = text
+        self._sorted.insert(bisect_left(self._sorted, (text, name)), (text, name))
+        for gram in _grams(text):
+            self._grams.setdefault(gram, set()).add(name)
+
+    def remove(self, name: str):
+        """Drop a profile"""
+        text = self._text.pop(name, None)
+        if text is None:
+            return
+        del self._sorted[bisect_left(self._sorted, (text, name))]
+        for gram in _grams(text):
+            names = self._grams[gram]
+            names.discard(name)
+            if not names:
+                del self._grams[gram]
+
+    def prefix(self, query: str):
+        """Profiles whose text starts with query"""
+        query = query.lower()
+        found = set()
+        for text, name in self._sorted[bisect_left(self._sorted, (query, "")) :]:
+            if not text.startswith(query):
+                break
+            found.add(name)
+        return found
+
+    def contains(self, query: str):
+        """Profiles whose text contains query"""
+        query = query.lower()
+        grams = _grams(query)
+        if not grams:
+            return {name for name, text in self._text.items() if query in text}
+        candidates = set.intersection(*(self._grams.get(gram, set()) for gram in grams))
+        return {name for name in candidates if query in self._text[name]}
+
+
+class ProfileIndex:
+    """In-memory inverted index of profiles by name, title, host and flags"""
+
+    def __init__(self) -> None:
+        self._lock = RLock()
+        self._reset()
+
+    def _reset(self):
+        self._names = _TextIndex()
+        self._titles = _TextIndex()
+        self._hosts: dict[str, set[str]] = {}
+        self._flags: dict[str, set[str]] = {flag: set() for flag in FLAGS}
+        self._profiles: dict[str, str] = {}
+        self._built = False
+
+    def _add(self, record: dict[str, Any]):
+        name = record["name"]
+        app = record.get("app", {})
+        start = record.get("start", {})
+        host = host_of(app.get("url"))
+        self._profiles[name] = host
+        self._names.add(name, name)
+        self._titles.add(name, str(app.get("title", "")))
+        self._hosts.setdefault(host, set()).add(name)
+        for flag, names in self._flags.items():
+            if app.get(flag, start.get(flag)) is True:
+                names.add(name)
+
+    def _remove(self, name: str):
+        host = self._profiles.pop(name, None)
+        if host is None:
+            return
+        self._names.remove(name)
+        self._titles.remove(name)
+        names = self._hosts[host]
+        names.discard(name)
+        if not names:
+            del self._hosts[host]
+        for names in self._flags.values():
+            names.discard(name)
+
+    def build(self):
+        """(Re)build the whole index from the catalog"""
+        with self._lock:
+            self._reset()
+            for record in CATALOG.profiles():
+                self._add(record)
+            self._built = True
+
+    def update(self, name: str):
+        """Reindex a single profile after it was created or changed"""
+        with self._lock:
+            if not self._built:
+                return
+            self._remove(name)
+            self._add(CATALOG.get(name))
+
+    def remove(self, name: str):
+        """Drop a profile after it was deleted or renamed away"""
+        with self._lock:
+            if self._built:
+                self._remove(name)
+
+    def search(
+        self,
+        query: str | None = None,
+        prefix: bool = False,
+        host: str | None = None,
+        flags: dict[str, bool] | None = None,
+    ):
+        """Return names of profiles matching every given criterion, sorted"""
+        with self._lock:
+            if not self._built:
+                self.build()
+            found = set(self._profiles)
+            if query:
+                lookup = "prefix" if prefix else "contains"
+                found &= getattr(self._names, lookup)(query) | getattr(self._titles, lookup)(query)
+            if host:
+                host = host.lower()
+                found &= {
+                    name
+                    for key, names in self._hosts.items()
+                    if key == host or key.endswith(f".{host}")
+                    for name in names
+                }
+            for flag, state in (flags or {}).items():
+                if flag not in self._flags:
+                    raise KeyError(flag)
+                found = found & self._flags[flag] if state else found - self._flags[flag]
+            return sorted(found)
+
+
+INDEX = ProfileIndex()
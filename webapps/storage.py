@@ -0,0 +1,272 @@
+"""Profile storage accounting and cache pruning"""
+
+import os
+import time
+from collections import deque
+from configparser import Error as ConfigError
+from concurrent.futures import ThreadPoolExecutor
+from json import dump, load
+from pathlib import Path
+from threading import Lock
+from typing import Any, Iterable, NamedTuple
+
+from webapps.profiles import CONFIG_DIR, PROFILE_DIR, Profile
+
+USAGE_FILE = CONFIG_DIR / "usage.json"
+USAGE_VERSION = 1
+# Regenerable browser caches: Chromium/QtWebEngine, WebKitGTK and WebView2 layouts.
+# Cookies, local storage and IndexedDB live elsewhere and are never pruned.
+CACHE_DIRS = frozenset(
+    {
+        "Cache",
+        "Code Cache",
+        "GPUCache",
+        "DawnCache",
+        "DawnGraphiteCache",
+        "DawnWebGPUCache",
+        "GrShaderCache",
+        "GraphiteDawnCache",
+        "ShaderCache",
+        "WebKitCache",
+    }
+)
+UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+# Directory path -> [mtime_ns, bytes of its files, number of files, subdirectory names]
+Record = list
+
+
+def parse_size(text: str | int) -> int:
+    """Parse sizes like 1024, 500M or 2GiB into bytes"""
+    if isinstance(text, int):
+        return text
+    value = text.strip().upper().removesuffix("B").removesuffix("I")
+    unit = value[-1:] if value[-1:] in UNITS else ""
+    return int(float(value[: len(value) - len(unit)]) * UNITS[unit])
+
+
+def format_size(size: int) -> str:
+    """Format bytes for humans"""
+    for unit in ("", "K", "M", "G"):
+        if size < 1024:
+            return f"{size:.0f}{unit}B" if not unit else f"{size:.1f}{unit}iB"
+        size /= 1024
+    return f"{size:.1f}TiB"
+
+
+def storage_path(name: str) -> Path:
+    """Where a profile keeps its browser data"""
+    try:
+        path = Profile.load(name).start_data.storage_path
+    except (ConfigError, TypeError, ValueError):
+        path = None
+    return Path(path) if path else PROFILE_DIR / name
+
+
+def profile_names() -> list[str]:
+    """Every profile on disk"""
+    try:
+        with os.scandir(PROFILE_DIR) as entries:
+            return sorted(entry.name for entry in entries if entry.is_dir())
+    except FileNotFoundError:
+        return []
+
+
+class UsageScanner:
+    """Disk usage of profiles, with per-directory results kept on disk.
+
+    A directory is listed again only when its mtime changed, that is when
+    entries were added, removed or renamed in it. Files growing in place
+    are seen on the next fresh scan."""
+
+    def __init__(self, path: Path = USAGE_FILE, workers: int = 8) -> None:
+        self._path = path
+        self._workers = workers
+        self._records: dict[str, Record] = {}
+        self._loaded = False
+        self._lock = Lock()
+
+    def _read(self):
+        self._loaded = True
+        try:
+            with open(self._path, encoding="utf-8") as file:
+                data = load(file)
+        except (FileNotFoundError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("version") == USAGE_VERSION:
+            self._records = data.get("directories", {})
+
+    def _flush(self, records: dict[str, Record]):
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self._path.with_suffix(".tmp")
+        with open(temp, "w", encoding="utf-8") as file:
+            dump({"version": USAGE_VERSION, "directories": records}, file)
+        os.replace(temp, self._path)
+
+    def _directory(self, path: str, fresh: bool, seen: dict[str, Record]) -> Record:
+        mtime = os.stat(path).st_mtime_ns
+        record = self._records.get(path)
+        if fresh or record is None or record[0] != mtime:
+            size = files = 0
+            children = []
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            children.append(entry.name)
+                        elif entry.is_file(follow_symlinks=False):
+                            size += entry.stat(follow_symlinks=False).st_size
+                            files += 1
+                    except FileNotFoundError:
+                        pass
+            record = [mtime, size, files, children]
+        seen[path] = record
+        return record
+
+    def _tree(self, path: str, in_cache: bool, fresh: bool, seen: dict[str, Record]):
+        """Return [bytes, cache bytes, files] under path"""
+        record = self._directory(path, fresh, seen)
+        total = [record[1], record[1] if in_cache else 0, record[2]]
+        for child in record[3]:
+            cache = in_cache or child in CACHE_DIRS
+            try:
+                sub = self._tree(os.path.join(path, child), cache, fresh, seen)
+            except (FileNotFoundError, NotADirectoryError, PermissionError):
+                continue
+            total = [a + b for a, b in zip(total, sub)]
+        return total
+
+    def _profile(self, name: str, fresh: bool):
+        path = storage_path(name)
+        seen: dict[str, Record] = {}
+        try:
+            size, cache, files = self._tree(os.fspath(path), False, fresh, seen)
+        except FileNotFoundError:
+            size = cache = files = 0
+        usage = {"path": str(path), "bytes": size, "cache": cache, "files": files}
+        return usage, seen
+
+    def usage(self, names: Iterable[str] | None = None, fresh: bool = False):
+        """Return bytes, cache bytes and file count of profiles (every one if names is None)"""
+        everything = names is None
+        names = profile_names() if names is None else list(names)
+        with self._lock:
+            if not self._loaded:
+                self._read()
+            with ThreadPoolExecutor(max_workers=self._workers) as pool:
+                results = dict(zip(names, pool.map(lambda name: self._profile(name, fresh), names)))
+            # After a full scan, directories that weren't seen are gone
+            records = {} if everything else dict(self._records)
+            for _, seen in results.values():
+                records.update(seen)
+            changed = records != self._records
+            self._records = records
+            if changed:
+                self._flush(records)
+        return {name: usage for name, (usage, _) in results.items()}
+
+
+class PrunePolicy(NamedTuple):
+    """What pruning aims for, None means no limit"""
+
+    max_size: int | None = None  # bytes per profile
+    max_age: float | None = None  # seconds since a cache entry was last written
+    budget: int | None = None  # bytes for every profile together
+
+
+def prunable(root: Path) -> bool:
+    """Whether caches under root may be pruned: only inside PROFILE_DIR.
+
+    A storage path elsewhere, like ~ or ~/.config, may hold other
+    applications' caches under the same directory names."""
+    return root.resolve().is_relative_to(PROFILE_DIR.resolve())
+
+
+def cache_files(root: Path):
+    """Return (mtime, size, path) of every file in the cache directories under root"""
+    found = []
+    for base, dirs, files in os.walk(root):
+        if CACHE_DIRS.isdisjoint(Path(os.path.relpath(base, root)).parts):
+            continue
+        for name in files:
+            path = os.path.join(base, name)
+            try:
+                status = os.lstat(path)
+            except FileNotFoundError:
+                continue
+            found.append((status.st_mtime, status.st_size, path))
+    return found
+
+
+def prune(
+    policy: PrunePolicy,
+    names: Iterable[str] | None = None,
+    dry_run: bool = False,
+    job=None,
+) -> dict[str, Any]:
+    """Delete cache entries, oldest first, until every limit of policy holds.
+
+    Only files in browser cache directories are considered, and only for
+    profiles whose storage path is inside PROFILE_DIR; the others are
+    reported as skipped. job, if given, is a webui Job that receives the
+    progress of the deletion."""
+    usage = SCANNER.usage(names, fresh=True)
+    skipped = {
+        name: usage.pop(name)["path"]
+        for name in list(usage)
+        if not prunable(Path(usage[name]["path"]))
+    }
+    candidates = {
+        name: deque(sorted(cache_files(Path(info["path"])))) for name, info in usage.items()
+    }
+    sizes = {name: info["bytes"] for name, info in usage.items()}
+    plan: dict[str, list[tuple[float, int, str]]] = {name: [] for name in usage}
+
+    def take(name: str, entry):
+        plan[name].append(entry)
+        sizes[name] -= entry[1]
+
+    if policy.max_age is not None:
+        cutoff = time.time() - policy.max_age
+        for name, entries in candidates.items():
+            while entries and entries[0][0] < cutoff:
+                take(name, entries.popleft())
+    if policy.max_size is not None:
+        for name, entries in candidates.items():
+            while entries and sizes[name] > policy.max_size:
+                take(name, entries.popleft())
+    if policy.budget is not None:
+        pending = sorted((entry, name) for name, entries in candidates.items() for entry in entries)
+        total = sum(sizes.values())
+        for entry, name in pending:
+            if total <= policy.budget:
+                break
+            take(name, entry)
+            total -= entry[1]
+
+    if job is not None:
+        job.files_total = sum(len(entries) for entries in plan.values())
+        job.bytes_total = sum(entry[1] for entries in plan.values() for entry in entries)
+    report: dict[str, Any] = {
+        "dry_run": dry_run, "freed": 0, "files": 0, "profiles": {}, "skipped": skipped
+    }
+    for name, entries in plan.items():
+        freed = files = 0
+        for _, size, path in entries:
+            if not dry_run:
+                try:
+                    os.unlink(path)
+                except (FileNotFoundError, PermissionError):
+                    continue
+            freed += size
+            files += 1
+            if job is not None:
+                job.advance(size, 1)
+        if files:
+            report["profiles"][name] = {"freed": freed, "files": files}
+            report["freed"] += freed
+            report["files"] += files
+    return report
+
+
+SCANNER = UsageScanner()
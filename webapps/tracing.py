@@ -0,0 +1,71 @@
+"""Launch tracing: timestamps of each launch phase, reported to the Web UI"""
+
+import os
+import socket
+import time
+from json import dumps, loads
+from threading import Lock
+
+TRACE_ENV = "WEBAPPS_TRACE"
+# In launch order. spawn is stamped by the manager, the rest by the launched process
+PHASES = ("spawn", "interpreter", "imports", "profile", "window", "loaded", "shown")
+
+
+class Trace:
+    """Phase timestamps of one launch, sent to the manager once the window is up"""
+
+    def __init__(self, context: dict) -> None:
+        self.id = context["id"]
+        self.profile = context["profile"]
+        self.private = context.get("private", False)
+        self._socket = context["socket"]
+        self.marks: dict[str, float] = {"spawn": context["spawned"]}
+        self._lock = Lock()
+        self._sent = False
+
+    @classmethod
+    def from_env(cls, started: float | None = None):
+        """Trace of this process, if the manager asked for one. started is when main.py began"""
+        context = os.environ.pop(TRACE_ENV, None)
+        if not context:
+            return None
+        trace = cls(loads(context))
+        if started is not None:
+            trace.mark("interpreter", started)
+        return trace
+
+    def mark(self, phase: str, when: float | None = None):
+        """Stamp a phase, now unless told when"""
+        self.marks[phase] = time.time() if when is None else when
+
+    def watch(self, window):
+        """Stamp the loaded and shown events of a pywebview window, then report"""
+        window.events.loaded += lambda: self._event("loaded")
+        window.events.shown += lambda: self._event("shown")
+
+    def _event(self, phase: str):
+        with self._lock:
+            self.mark(phase)
+            done = "loaded" in self.marks and "shown" in self.marks and not self._sent
+            self._sent = self._sent or done
+        if done:
+            self.report()
+
+    def report(self, error: str | None = None):
+        """Send the trace to the manager, if it still listens"""
+        message = {
+            "id": self.id,
+            "profile": self.profile,
+            "private": self.private,
+            "marks": self.marks,
+            "error": error,
+        }
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.settimeout(2)
+        try:
+            client.connect(self._socket)
+            client.sendall((dumps(message) + "\n").encode())
+        except OSError:
+            pass
+        finally:
+            client.close()
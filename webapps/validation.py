@@ -1,5 +1,7 @@
 """Validation helper"""
-from typing import NamedTuple
+from collections import OrderedDict
+from threading import Lock
+from typing import AbstractSet, Callable, Hashable, NamedTuple
 
 class ValidateEntry(NamedTuple):
     """Validation entry"""
@@ -7,6 +9,13 @@ class ValidateEntry(NamedTuple):
     of: str
     message: str
 
+class Rule(NamedTuple):
+    """Validation rule, check is called with the values of fields in order"""
+    fields: tuple[str, ...]
+    check: Callable[..., bool]
+    of: str
+    message: str
+
 class Validation:
     """validation"""
     def __init__(self) -> None:
@@ -17,6 +26,74 @@ class Validation:
         if not condition:
             self._data.append(ValidateEntry(condition, of, message))
 
+    def extend(self, other: "Validation"):
+        """Add entries of another validation"""
+        self._data.extend(other._data)
+        return self
+
     def to_json(self):
         """Return things to JSON"""
         return [a._asdict() for a in self._data]
+
+class Validator:
+    """Rules of a NamedTuple, compiled to field indexes.
+
+    Checks made under a key remember the values and per-rule results, so the
+    next check of that key only reruns rules reading a field that changed."""
+    def __init__(self, kind: type, rules: tuple[Rule, ...], cache_size: int = 64) -> None:
+        index = {field: position for position, field in enumerate(kind._fields)}
+        self._rules = [(tuple(index[field] for field in rule.fields), rule) for rule in rules]
+        self._by_field: dict[str, tuple[int, ...]] = {
+            field: tuple(
+                number for number, (_, rule) in enumerate(self._rules) if field in rule.fields
+            )
+            for field in kind._fields
+        }
+        self._fields = kind._fields
+        self._last: OrderedDict[Hashable, tuple[tuple, list[bool]]] = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = Lock()
+
+    def _run(self, values: tuple, number: int) -> bool:
+        indexes, rule = self._rules[number]
+        return bool(rule.check(*(values[position] for position in indexes)))
+
+    def validate(
+        self,
+        values: tuple,
+        changed: AbstractSet[str] | None = None,
+        key: Hashable | None = None,
+    ) -> Validation:
+        """Check values, only the rules reading a changed field if given"""
+        last = None
+        if key is not None:
+            with self._lock:
+                last = self._last.get(key)
+        if last is not None:
+            results = list(last[1])
+            stale = {
+                number
+                for field, old, new in zip(self._fields, last[0], values)
+                # 1 == True and 800 == 800.0, yet rules may tell them apart
+                if old is not new and (type(old) is not type(new) or old != new)
+                for number in self._by_field[field]
+            }
+            for number in stale:
+                results[number] = self._run(values, number)
+        else:
+            results = [
+                self._run(values, number)
+                if changed is None or not changed.isdisjoint(rule.fields)
+                else True
+                for number, (_, rule) in enumerate(self._rules)
+            ]
+        if key is not None and (last is not None or changed is None):
+            with self._lock:
+                self._last[key] = (tuple(values), results)
+                self._last.move_to_end(key)
+                while len(self._last) > self._cache_size:
+                    self._last.popitem(last=False)
+        vl = Validation()
+        for passed, (_, rule) in zip(results, self._rules):
+            vl.set(passed, rule.of, rule.message)
+        return vl
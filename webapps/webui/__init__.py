@@ -2,6 +2,7 @@
 from .webview_api import WebviewAPI
 from .os_api import OSAPI
 from .config_api import ConfigAPI
+from .metrics import METRICS
 
 class API:
     """API to pass"""
@@ -18,8 +19,12 @@ class API:
         """App version"""
         return 'v0.0.1'
 
+    def metrics(self):
+        """Calls, latency percentiles, payload sizes and errors by method, when --metrics is on"""
+        return {"enabled": METRICS.enabled, "methods": METRICS.snapshot()}
+
     webview = WebviewAPI()
     os = OSAPI()
-    config = ConfigAPI()
+    config = ConfigAPI(write_behind=0.25)
 
 api = API()
@@ -0,0 +1,113 @@
+"""Local HTTP server of the Web UI assets"""
+import logging
+import os
+from functools import partial
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Thread
+
+from .bundle import COMPRESSED, DATA_DIR, DIST, load_manifest
+
+# Preferred first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+class AssetHandler(SimpleHTTPRequestHandler):
+    """Serves pre-compressed variants where the client takes them, with ETags.
+
+    Content-hashed bundle files never change under their name and are
+    cached for good; everything else is revalidated on every use."""
+
+    extensions_map = {
+        **SimpleHTTPRequestHandler.extensions_map,
+        ".mjs": "text/javascript",
+        ".js": "text/javascript",
+    }
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logging.debug("Assets: " + format, *args)
+
+    def list_directory(self, path):
+        self.send_error(HTTPStatus.NOT_FOUND)
+
+    def _variant(self, relative: str, status: os.stat_result):
+        accepted = self.headers.get("Accept-Encoding", "")
+        accepted = {part.split(";")[0].strip() for part in accepted.split(",")}
+        root = Path(self.directory)
+        for encoding, suffix in ENCODINGS:
+            if encoding not in accepted:
+                continue
+            variant = root / COMPRESSED / (relative + suffix)
+            try:
+                packed = os.stat(variant)
+            except FileNotFoundError:
+                continue
+            # A variant older than its file is stale
+            if packed.st_mtime_ns >= status.st_mtime_ns:
+                return encoding, variant, packed
+        return None
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            return super().send_head()
+        relative = Path(path).relative_to(Path(self.directory).resolve()).as_posix()
+        status = os.stat(path)
+        variant = self._variant(relative, status)
+        encoding = variant[0] if variant else "identity"
+        etag = f'"{status.st_mtime_ns:x}-{status.st_size:x}-{encoding}"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": IMMUTABLE if relative in self.server.immutable else REVALIDATE,
+            "Vary": "Accept-Encoding",
+        }
+        if etag in self.headers.get("If-None-Match", ""):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.end_headers()
+            return None
+        if variant:
+            _, path, status = variant
+            headers["Content-Encoding"] = encoding
+        file = open(path, "rb")  # pylint: disable=consider-using-with
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", self.guess_type(relative))
+        self.send_header("Content-Length", str(status.st_size))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        return file
+
+
+class AssetServer:
+    """Serves root on a free localhost port from a daemon thread"""
+
+    def __init__(self, root: Path = DATA_DIR, port: int = 0) -> None:
+        self._root = Path(root).resolve()
+        self._port = port
+        self._server: ThreadingHTTPServer | None = None
+
+    def start(self):
+        """Start serving, return self"""
+        manifest = load_manifest(self._root) or {"files": {}}
+        immutable = frozenset(f"{DIST}/{output}" for output in manifest["files"].values())
+        handler = partial(AssetHandler, directory=str(self._root))
+        self._server = ThreadingHTTPServer(("127.0.0.1", self._port), handler)
+        self._server.immutable = immutable
+        Thread(target=self._server.serve_forever, name="assets", daemon=True).start()
+        return self
+
+    def url(self, relative: str) -> str:
+        """URL of a file under root"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/{relative}"
+
+    def stop(self):
+        """Stop serving"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
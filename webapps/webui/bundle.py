@@ -0,0 +1,265 @@
+"""Web UI bundle: content-hashed modules, inlined templates, pre-compressed assets"""
+import gzip
+import os
+import re
+from hashlib import sha256
+from json import dump, dumps, load
+from pathlib import Path
+from shutil import rmtree
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only
+    brotli = None
+
+DATA_DIR = Path("data")
+# All relative to DATA_DIR. Pre-compressed variants of every served file are
+# kept under COMPRESSED at the same relative path, plus .gz or .br
+DIST = "dist"
+COMPRESSED = "dist/compressed"
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 2
+ENTRY = "main.html"
+# Next to main.html rather than under DIST: pywebview serves the directory of
+# the page it opens, and vendor files are only found from DATA_DIR
+BUNDLE_ENTRY = "main.bundle.html"
+TEMPLATE_DIRS = ("template", "page")
+COMPRESSIBLE = frozenset({".css", ".html", ".js", ".json", ".mjs", ".svg", ".txt"})
+HASH_LENGTH = 10
+IMPORT = re.compile(r"""(\bfrom\s*|\bimport\s*\(?\s*)(["'])(\.\.?/[^"']+?\.m?js)\2""")
+REFERENCE = re.compile(r"""\b(src|href)="([^"#:]+)\"""")
+PRELOAD = """\
+// Generated by webui_build: answers template and page fetches from memory
+(() => {
+  const TEMPLATES = %s;
+  const base = new URL(".", document.baseURI).href;
+  const fetch = window.fetch.bind(window);
+  window.fetch = (input, init) => {
+    const url = new URL(typeof input === "string" ? input : input.url, document.baseURI).href;
+    const key = url.startsWith(base) ? url.slice(base.length) : null;
+    if (key !== null && Object.hasOwn(TEMPLATES, key))
+      return Promise.resolve(new Response(TEMPLATES[key], {
+        headers: { "Content-Type": "text/html; charset=utf-8" },
+      }));
+    return fetch(input, init);
+  };
+})();
+"""
+
+
+def hashed_name(path: str, content: bytes) -> str:
+    """main.mjs -> main.0123456789.mjs"""
+    stem, dot, suffix = path.rpartition(".")
+    return f"{stem}.{sha256(content).hexdigest()[:HASH_LENGTH]}{dot}{suffix}"
+
+
+def _stamp(path: Path):
+    status = os.stat(path)
+    return [status.st_mtime_ns, status.st_size]
+
+
+def _relative(path: Path, root: Path) -> str:
+    return path.relative_to(root).as_posix()
+
+
+class Bundler:
+    """Builds root/dist from the sources under root"""
+
+    def __init__(self, root: Path = DATA_DIR) -> None:
+        self._root = root
+        self._dist = root / DIST
+        self._files: dict[str, str] = {}  # source -> hashed output, both relative to root
+        self._sources: dict[str, list[int]] = {}
+        self._visiting: set[str] = set()
+
+    def _read(self, relative: str) -> bytes:
+        path = self._root / relative
+        if not path.is_file():
+            raise FileNotFoundError(f"{path} is missing, run `main.py webui` to install it first")
+        self._sources[relative] = _stamp(path)
+        return path.read_bytes()
+
+    def _emit(self, relative: str, content: bytes) -> str:
+        output = hashed_name(relative, content)
+        target = self._dist / output
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(content)
+        self._files[relative] = output
+        return output
+
+    def module(self, relative: str) -> str:
+        """Emit a module after its imports, whose specifiers then point to hashed names"""
+        if relative in self._files:
+            return self._files[relative]
+        if relative in self._visiting:
+            raise ValueError(f"Import cycle through {relative}")
+        self._visiting.add(relative)
+        text = self._read(relative).decode("utf-8")
+        directory = os.path.dirname(relative)
+
+        def rewrite(match: re.Match) -> str:
+            prefix, quote, specifier = match.groups()
+            target = os.path.normpath(os.path.join(directory, specifier)).replace(os.sep, "/")
+            output = self.module(target)
+            new = os.path.relpath(output, directory or ".").replace(os.sep, "/")
+            return f"{prefix}{quote}{new if new.startswith('.') else './' + new}{quote}"
+
+        content = IMPORT.sub(rewrite, text).encode("utf-8")
+        self._visiting.discard(relative)
+        return self._emit(relative, content)
+
+    def templates(self) -> dict[str, str]:
+        """Every template and page, which stay in place for whatever doesn't go through fetch"""
+        found = {}
+        for directory in TEMPLATE_DIRS:
+            for path in sorted((self._root / directory).glob("*.html")):
+                relative = _relative(path, self._root)
+                found[relative] = self._read(relative).decode("utf-8")
+        return found
+
+    def entry(self, templates: dict[str, str]) -> str:
+        """Rewrite main.html to the hashed files, preloading every module"""
+        html = self._read(ENTRY).decode("utf-8")
+        scripts = [match[1] for match in REFERENCE.findall(html) if match[0] == "src"]
+        styles = [match[1] for match in REFERENCE.findall(html) if match[0] == "href"]
+        for reference in scripts + styles:
+            if not reference.startswith("vendor/"):
+                if reference.endswith((".mjs", ".js")):
+                    self.module(reference)
+                else:
+                    self._emit(reference, self._read(reference))
+        preload = self._emit("preload.js", (PRELOAD % dumps(templates)).encode("utf-8"))
+
+        def rewrite(match: re.Match) -> str:
+            attribute, reference = match.groups()
+            # Vendor files stay where they are
+            output = self._files.get(reference)
+            return f'{attribute}="{f"{DIST}/{output}" if output else reference}"'
+
+        html = REFERENCE.sub(rewrite, html)
+        links = [f'<script src="{DIST}/{preload}"></script>']
+        links += [
+            f'<link rel="modulepreload" href="{DIST}/{output}">'
+            for source, output in sorted(self._files.items())
+            if source.endswith(".mjs")
+        ]
+        head = "\n    ".join(links)
+        html = html.replace("<script ", f"{head}\n    <script ", 1)
+        (self._root / BUNDLE_ENTRY).write_text(html, encoding="utf-8")
+        return BUNDLE_ENTRY
+
+    def build(self) -> dict:
+        """Build the bundle from scratch and return its manifest"""
+        if self._dist.exists():
+            rmtree(self._dist)
+        self._dist.mkdir(parents=True)
+        templates = self.templates()
+        entry = self.entry(templates)
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "entry": entry,
+            "files": self._files,
+            "templates": templates,
+            "sources": self._sources,
+        }
+        missing = unresolved(self._root, entry)
+        if missing:
+            raise FileNotFoundError(
+                f"{', '.join(missing)} can't be found from {entry}, "
+                "run `main.py webui` to install the Web UI first"
+            )
+        manifest["compressed"] = compress_tree(self._root, self._root / COMPRESSED)
+        with open(self._dist / MANIFEST_NAME, "w", encoding="utf-8") as file:
+            dump(manifest, file, indent=1)
+        return manifest
+
+
+def unresolved(root: Path, entry: str) -> list[str]:
+    """References of a page, and imports of its modules, with no file behind them.
+
+    They are resolved as pywebview would, from the directory of the page,
+    which is all it serves."""
+    page = root / entry
+    served = page.parent.resolve()
+    html = page.read_text(encoding="utf-8")
+    pending = [page.parent / reference for _, reference in REFERENCE.findall(html)]
+    missing = []
+    seen = set()
+    while pending:
+        path = Path(os.path.normpath(pending.pop()))
+        if path in seen:
+            continue
+        seen.add(path)
+        if not path.resolve().is_relative_to(served) or not path.is_file():
+            missing.append(os.path.relpath(path, root).replace(os.sep, "/"))
+        elif path.suffix in (".mjs", ".js"):
+            text = path.read_text(encoding="utf-8")
+            pending += [path.parent / match[2] for match in IMPORT.findall(text)]
+    return sorted(missing)
+
+
+def compress_tree(root: Path, output: Path) -> dict[str, list[int]]:
+    """Write gzip (and brotli, if installed) variants of every compressible file under root.
+
+    Returns [raw, gzip, brotli] sizes by path relative to root, 0 where not written."""
+    sizes = {}
+    for base, dirs, files in os.walk(root):
+        if Path(base) == output.parent:
+            dirs[:] = [name for name in dirs if name != output.name]
+        for name in files:
+            path = Path(base) / name
+            if path.suffix not in COMPRESSIBLE:
+                continue
+            relative = _relative(path, root)
+            data = path.read_bytes()
+            target = output / relative
+            target.parent.mkdir(parents=True, exist_ok=True)
+            packed = gzip.compress(data, 9, mtime=0)
+            target.with_name(target.name + ".gz").write_bytes(packed)
+            size = [len(data), len(packed), 0]
+            if brotli is not None:
+                packed = brotli.compress(data)
+                target.with_name(target.name + ".br").write_bytes(packed)
+                size[2] = len(packed)
+            sizes[relative] = size
+    return sizes
+
+
+def build(root: Path = DATA_DIR) -> dict:
+    """Build the Web UI bundle under root/dist, and its page next to main.html.
+
+    Return its manifest"""
+    return Bundler(root).build()
+
+
+def load_manifest(root: Path = DATA_DIR) -> dict | None:
+    """Manifest of the bundle, None if it wasn't built or its sources changed since"""
+    try:
+        with open(root / DIST / MANIFEST_NAME, encoding="utf-8") as file:
+            manifest = load(file)
+    except (FileNotFoundError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    templates = {
+        _relative(path, root)
+        for directory in TEMPLATE_DIRS
+        for path in (root / directory).glob("*.html")
+    }
+    if templates != set(manifest["templates"]):
+        return None
+    for relative, stamp in manifest["sources"].items():
+        try:
+            if _stamp(root / relative) != stamp:
+                return None
+        except FileNotFoundError:
+            return None
+    return manifest
+
+
+def entry_point(root: Path = DATA_DIR) -> str:
+    """Page the Web UI should open, relative to root: the bundle when it is current"""
+    manifest = load_manifest(root)
+    if manifest is None or not (root / manifest["entry"]).is_file():
+        return ENTRY
+    return manifest["entry"]
@@ -1,66 +1,247 @@
-# pylint: disable=protected-access
-
 """Config API"""
 import logging
-from sqlite3 import OperationalError
+from atexit import register
+from collections import OrderedDict
 from json import loads, dumps
+from threading import Lock, Timer
 from typing import Any
-from sqlite_database import Database, text
-from ..profiles import CONFIG_DIR
+from .store import Store
+from ..profiles import CONFIG_DIR, ensure_dirs
+
+UPSERT = (
+    "INSERT INTO config (name, value) VALUES (?, ?) "
+    "ON CONFLICT(name) DO UPDATE SET value = excluded.value"
+)
+
 
 class ConfigAPI:
-    """Config API"""
+    """Config API
+
+    With write_behind (seconds), set calls are coalesced in memory and
+    committed together once that delay passes, on flush() or at exit.
+
+    Decoded values are kept in an LRU cache of cache_size entries; it is
+    dropped whenever another connection commits to config.db. Returned
+    values are shared with the cache and must not be mutated.
 
-    def __init__(self) -> None:
+    Safe to call from several threads: each gets its own connection."""
+
+    def __init__(self, write_behind: float = 0, cache_size: int = 256) -> None:
+        ensure_dirs()
         self._path = CONFIG_DIR / "config.db"
-        self._db = Database(self._path)
+        self._store = Store(self._path)
+        self._write_behind = write_behind
+        self._pending: dict[str, Any] = {}
+        # Taken from _pending by flush, still visible to reads until committed
+        self._flushing: dict[str, Any] = {}
+        self._timer: Timer | None = None
+        self._lock = Lock()
+        self._cache: OrderedDict[str, Any] = OrderedDict()
+        self._cache_size = cache_size
+        self._data_version = None
+        self._epoch = 0
+        self._hits = 0
+        self._misses = 0
 
-        try:
-            self._config = self._db.table("config")
-            self._config.exists()
-        except OperationalError:
-            self._config = self._db.create_table("config", [
-                text("name").unique(),
-                text('value')
-            ])
+        self._store.execute("CREATE TABLE IF NOT EXISTS config (name TEXT UNIQUE, value TEXT)")
+        if write_behind:
+            register(self.flush)
 
     def exists(self, condition) -> bool:
         """Check if data exists"""
-        data = self._config.select_one(condition)
-        if len(data) == 0:
-            return False
-        return True
+        unknown = set(condition) - {"name", "value"}
+        if unknown:
+            raise KeyError(unknown.pop())
+        where = " AND ".join(f"{column} = ?" for column in condition) or "1"
+        return self._store.execute(
+            f"SELECT 1 FROM config WHERE {where} LIMIT 1", tuple(condition.values())
+        ).fetchone() is not None
+
+    def _check_version(self):
+        """Drop the cache if another connection changed config.db. Call with lock held"""
+        version = self._store.data_version()
+        if version != self._data_version:
+            self._data_version = version
+            self._epoch += 1
+            self._cache.clear()
+
+    def _cached(self, name: str, value: Any, epoch: int):
+        """Remember a decoded value read at epoch. Call with lock held"""
+        if self._cache_size <= 0 or epoch != self._epoch:
+            return
+        self._cache[name] = value
+        self._cache.move_to_end(name)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
 
     def get(self, name: str):
         """Return data from value"""
         logging.debug("Get -> %s", name)
-        data = self._config.select_one({'name': name})
-        if len(data) == 0:
+        with self._lock:
+            pending = self._pending.get(name, self._flushing.get(name))
+            if pending is None:
+                self._check_version()
+                if name in self._cache:
+                    self._hits += 1
+                    self._cache.move_to_end(name)
+                    return self._cache[name]
+                self._misses += 1
+            epoch = self._epoch
+        if pending is not None:
+            return loads(pending)
+        data = self._store.execute("SELECT value FROM config WHERE name = ?", (name,)).fetchone()
+        if data is None:
             raise KeyError(name)
-        return loads(data.value)
+        value = loads(data["value"])
+        with self._lock:
+            self._cached(name, value, epoch)
+        return value
+
+    def get_many(self, names: list[str]) -> dict[str, Any]:
+        """Return data of every existing name, in one query"""
+        logging.debug("Get many -> %d", len(names))
+        names = list(dict.fromkeys(names))
+        found = {}
+        with self._lock:
+            self._check_version()
+            epoch = self._epoch
+            for name in names:
+                pending = self._pending.get(name, self._flushing.get(name))
+                if pending is not None:
+                    found[name] = loads(pending)
+                elif name in self._cache:
+                    self._hits += 1
+                    self._cache.move_to_end(name)
+                    found[name] = self._cache[name]
+        missing = [name for name in names if name not in found]
+        if missing:
+            cursor = self._store.execute(
+                f"SELECT name, value FROM config WHERE name IN ({', '.join('?' * len(missing))})",
+                missing,
+            )
+            with self._lock:
+                self._misses += len(missing)
+                for row in cursor:
+                    found[row["name"]] = loads(row["value"])
+                    self._cached(row["name"], found[row["name"]], epoch)
+        return {name: found[name] for name in names if name in found}
+
+    def cache_stats(self):
+        """Return hit/miss counters and size of the read cache"""
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "size": len(self._cache),
+                "capacity": self._cache_size,
+            }
+
+    def _commit(self, sql: str, rows: list[tuple]) -> int:
+        """Run sql for each row in one transaction, return the affected row count.
+
+        Each row starts with the name it writes. The lock is only taken to
+        update the cache, so reads never wait for the database write lock."""
+        with self._store.transaction() as conn:
+            # Nobody else can commit until we do: a change seen now came before us
+            version = self._store.data_version()
+            own = conn.execute("PRAGMA data_version").fetchone()[0]
+            with self._lock:
+                if version != self._data_version:
+                    self._epoch += 1
+                    self._cache.clear()
+            cursor = conn.executemany(sql, rows)
+        # The watch connection counts our commit, ours doesn't: if ours moved,
+        # someone else committed after us, before the version below was read.
+        version = self._store.data_version()
+        foreign = conn.execute("PRAGMA data_version").fetchone()[0] != own
+        with self._lock:
+            # Reads that started before the commit must not cache what they got
+            self._epoch += 1
+            for row in rows:
+                self._cache.pop(row[0], None)
+            if foreign:
+                self._cache.clear()
+            self._data_version = version
+        return cursor.rowcount
+
+    def _forget(self, names):
+        with self._lock:
+            self._epoch += 1
+            for name in names:
+                self._cache.pop(name, None)
 
     def set(self, name: str, value: Any):
         """Set data to config store"""
         parsed = dumps(value)
         logging.debug("Set -> %s", name)
-        if self.exists({'name': name}):
-            self._config.update_one({'name': name}, {'value': parsed})
-            self._config._sql.commit()
+        self._forget((name,))
+        if self._write_behind:
+            self._defer(name, parsed)
             return
-        self._config.insert({'name': name, 'value': parsed})
-        self._config._sql.commit()
+        self._commit(UPSERT, [(name, parsed)])
+
+    def set_many(self, values: dict[str, Any]):
+        """Set several data to config store in a single transaction"""
+        logging.debug("Set many -> %d", len(values))
+        parsed = [(name, dumps(value)) for name, value in values.items()]
+        with self._lock:
+            self._epoch += 1
+            for name, _ in parsed:
+                self._pending.pop(name, None)
+                self._flushing.pop(name, None)
+                self._cache.pop(name, None)
+        self._commit(UPSERT, parsed)
 
     def set_if_not_exists(self, name: str, value: Any):
         """Set data to config store IF not exists"""
         logging.debug("Set IF NOT EXISTS -> %s", name)
-        if not self.exists({'name': name}):
-            self._config.insert({'name': name, 'value': dumps(value)})
-        self._config._sql.commit()
+        with self._lock:
+            if name in self._pending or name in self._flushing:
+                return
+        self._commit(
+            "INSERT INTO config (name, value) VALUES (?, ?) ON CONFLICT(name) DO NOTHING",
+            [(name, dumps(value))],
+        )
 
     def delete(self, name: str):
         """Delete a data from config store"""
         logging.debug("Delete -> %s", name)
+        return self.delete_many([name])
+
+    def delete_many(self, names: list[str]) -> int:
+        """Delete several data from config store in a single transaction"""
+        logging.debug("Delete many -> %d", len(names))
+        self._forget(names)
+        with self._lock:
+            deferred = sum(self._pending.pop(name, None) is not None for name in names)
+            for name in names:
+                self._flushing.pop(name, None)
+        deleted = self._commit("DELETE FROM config WHERE name = ?", [(name,) for name in names])
+        return max(deleted, deferred)
+
+    def _defer(self, name: str, parsed: str):
+        with self._lock:
+            self._pending[name] = parsed
+            if self._timer is None:
+                self._timer = Timer(self._write_behind, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Commit every deferred write now"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushing.update(pending)
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return
+        logging.debug("Flush -> %d", len(pending))
         try:
-            return self._config.delete_one({'name': name})
-        except OperationalError:
-            return 0
+            self._commit(UPSERT, list(pending.items()))
+        finally:
+            with self._lock:
+                for name, parsed in pending.items():
+                    if self._flushing.get(name) is parsed:
+                        del self._flushing[name]
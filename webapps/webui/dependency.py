@@ -1,57 +1,343 @@
 """Webui Dependency Manager"""
 import os
+from concurrent.futures import ThreadPoolExecutor, wait
+from hashlib import sha256
+from json import dump, load
+from pathlib import Path
+from shutil import copyfile
+from threading import Lock
+from typing import NamedTuple
 from zipfile import ZipFile
 from tqdm import tqdm
 import requests
 
-def download_file(url, destination):
-    """Download a file with a progress bar using requests and tqdm."""
-    response = requests.head(url, timeout=10)
-    total_size = int(response.headers.get("content-length", 0))
-
-    with requests.get(url, stream=True, timeout=10) as r, open(destination, "wb") as f:
-        r.raise_for_status()
-        with tqdm(
-            total=total_size, unit="B", unit_scale=True, desc=destination, ncols=100
-        ) as pbar:
-            for chunk in r.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-                    pbar.update(len(chunk))
-
-
-def install_webui_dependency(force=False):
-    """Install Web UI dependencies."""
-    if os.path.exists("data/vendor/jquery.js") and not force:
-        return
-
-    urls = {
-        "bootstrap_icons": "https://github.com/twbs/icons/releases/download/v1.11.3/bootstrap-icons-1.11.3.zip",
-        "bootstrap": "https://github.com/twbs/bootstrap/releases/download/v5.3.3/bootstrap-5.3.3-dist.zip",
-        "jquery": "https://code.jquery.com/jquery-3.6.4.min.js",
-        "enigmarimu": "https://rimueirnarn.github.io/package-snapshot/enigmarimu.js.zip",
-    }
+from ..profiles import CONFIG_DIR
+
+VENDOR_DIR = Path("data/vendor")
+CACHE_DIR = CONFIG_DIR / "cache" / "vendor"
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+CHUNK_SIZE = 65536
+
+
+class Package(NamedTuple):
+    """Vendor package. sha256, when known, pins the downloaded artifact"""
+
+    name: str
+    url: str
+    version: str
+    sha256: str | None = None
+
+
+PACKAGES = (
+    Package(
+        "bootstrap_icons",
+        "https://github.com/twbs/icons/releases/download/v1.11.3/bootstrap-icons-1.11.3.zip",
+        "1.11.3",
+    ),
+    Package(
+        "bootstrap",
+        "https://github.com/twbs/bootstrap/releases/download/v5.3.3/bootstrap-5.3.3-dist.zip",
+        "5.3.3",
+    ),
+    Package("jquery", "https://code.jquery.com/jquery-3.6.4.min.js", "3.6.4"),
+    Package(
+        "enigmarimu",
+        "https://rimueirnarn.github.io/package-snapshot/enigmarimu.js.zip",
+        "snapshot",
+    ),
+)
+
+
+def hash_file(path) -> str:
+    """SHA-256 of a file"""
+    digest = sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 
-    os.makedirs("data/vendor", exist_ok=True)
+def _validator(response) -> str | None:
+    """Strong ETag, or else Last-Modified, of a response: what If-Range accepts"""
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified")
 
-    for name, url in urls.items():
-        print(f"Downloading {name} from {url}...")
-        destination = (
-            f"data/vendor/{name}.js"
-            if url.endswith(".js")
-            else f"data/vendor/{name}.zip"
+
+def _content_range(response) -> tuple[int | None, int | None]:
+    """Start and total length from Content-Range ("bytes N-M/T" or "bytes */T"), if given"""
+    try:
+        unit, spec = response.headers["Content-Range"].split(" ", 1)
+        span, total = spec.split("/")
+        if unit != "bytes":
+            return None, None
+        return (
+            None if span == "*" else int(span.split("-")[0]),
+            None if total == "*" else int(total),
         )
+    except (KeyError, ValueError):
+        return None, None
+
+
+def download_file(url, destination, position=0) -> bool:
+    """Download a file with a progress bar, return whether a partial destination was resumed.
 
-        # Use download_file function with progress bar
-        download_file(url, destination)
+    The validator (ETag or Last-Modified) of the response is kept beside
+    the destination until it is complete. A partial destination is resumed
+    with a Range request only if the remote file still matches it, and
+    starts over otherwise."""
+    validator_path = Path(f"{destination}.validator")
+    offset = os.path.getsize(destination) if os.path.exists(destination) else 0
+    try:
+        validator = validator_path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        validator = ""
+    if not validator:
+        offset = 0
+    headers = {"Range": f"bytes={offset}-", "If-Range": validator} if offset else {}
 
-        if url.endswith(".zip"):
-            # Unzip the file if it is a zip
-            with ZipFile(destination) as zip_file:
-                zip_file.extractall("data/vendor/")
-                print(f"{name} extracted to data/vendor")
-            os.remove(destination)  # Clean up the zip file after extraction
+    with requests.get(url, stream=True, timeout=10, headers=headers) as r:
+        if offset and r.status_code == 416:
+            # Range starts at the end: complete if the remote length is what we have
+            if _content_range(r)[1] == offset:
+                validator_path.unlink()
+                return True
+            restart = True
         else:
-            print(f"{name} saved to {destination}")
+            r.raise_for_status()
+            # Resumed anywhere but where the partial file ends would splice garbage in
+            restart = r.status_code == 206 and _content_range(r)[0] != offset
+        if not restart:
+            if r.status_code != 206:
+                offset = 0
+                validator = _validator(r)
+                if validator:
+                    validator_path.write_text(validator, encoding="utf-8")
+                else:
+                    validator_path.unlink(missing_ok=True)
+            _write_response(r, destination, offset, os.path.basename(url), position)
+    if restart:
+        os.unlink(destination)
+        validator_path.unlink()
+        return download_file(url, destination, position)
+    validator_path.unlink(missing_ok=True)
+    return offset > 0
+
+
+def _write_response(r, destination, offset: int, desc: str, position: int):
+    """Write a streamed response to destination from offset, with a progress bar"""
+    total_size = int(r.headers.get("content-length", 0)) + offset
+    with open(destination, "ab" if offset else "wb") as f, tqdm(
+        total=total_size,
+        initial=offset,
+        unit="B",
+        unit_scale=True,
+        desc=desc,
+        ncols=100,
+        position=position,
+    ) as pbar:
+        for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+            if chunk:
+                f.write(chunk)
+                pbar.update(len(chunk))
+
+
+class ArtifactCache:
+    """Content-addressed store of downloaded artifacts, indexed by URL"""
+
+    def __init__(self, root: Path = CACHE_DIR) -> None:
+        self._root = root
+        self._index_path = root / "index.json"
+        self._lock = Lock()
+        try:
+            with open(self._index_path, encoding="utf-8") as file:
+                self._index: dict[str, str] = load(file)
+        except (FileNotFoundError, ValueError):
+            self._index = {}
+
+    def lookup(self, url: str, expected: str | None = None) -> Path | None:
+        """Return the cached, verified artifact of url, if any"""
+        digest = expected or self._index.get(url)
+        if digest is None:
+            return None
+        blob = self._root / digest
+        if blob.exists() and hash_file(blob) == digest:
+            return blob
+        return None
+
+    def fetch(self, url: str, expected: str | None = None, position: int = 0) -> Path:
+        """Return the artifact of url, downloading (or resuming) it on a cache miss"""
+        blob = self.lookup(url, expected)
+        if blob is not None:
+            return blob
+        partial = self._root / "partial" / sha256(url.encode()).hexdigest()
+        partial.parent.mkdir(parents=True, exist_ok=True)
+        resumed = download_file(url, partial, position)
+        digest = hash_file(partial)
+        if expected is not None and digest != expected:
+            partial.unlink()
+            raise ValueError(f"Checksum mismatch for {url}: expected {expected}, got {digest}")
+        blob = self._root / digest
+        os.replace(partial, blob)
+        if resumed and expected is None:
+            # Nothing vouches for an unpinned artifact put together from two responses
+            return blob
+        with self._lock:
+            self._index[url] = digest
+        return blob
+
+    def save(self):
+        """Write the URL index"""
+        with self._lock:
+            self._root.mkdir(parents=True, exist_ok=True)
+            with open(self._index_path, "w", encoding="utf-8") as file:
+                dump(self._index, file, indent=2)
+
+
+def load_manifest(vendor_dir: Path) -> dict[str, dict]:
+    """Return installed packages recorded in vendor_dir, by name"""
+    try:
+        with open(vendor_dir / MANIFEST_NAME, encoding="utf-8") as file:
+            manifest = load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest.get("packages", {})
+
+
+def save_manifest(vendor_dir: Path, packages: dict[str, dict]):
+    """Record installed packages in vendor_dir"""
+    temp = vendor_dir / f"{MANIFEST_NAME}.tmp"
+    with open(temp, "w", encoding="utf-8") as file:
+        dump({"version": MANIFEST_VERSION, "packages": packages}, file, indent=1, sort_keys=True)
+    os.replace(temp, vendor_dir / MANIFEST_NAME)
+
+
+def verify_file(vendor_dir: Path, name: str, size: int, digest: str, full: bool) -> bool:
+    """Check an installed file against its manifest record, by size or by full hash"""
+    path = os.path.join(vendor_dir, name)
+    try:
+        if os.stat(path).st_size != size:
+            return False
+    except FileNotFoundError:
+        return False
+    return not full or hash_file(path) == digest
+
+
+def verify_package(pool, vendor_dir: Path, entry: dict, full: bool) -> bool:
+    """Check every installed file of a package, hashing them in parallel if full"""
+    files = entry["files"].items()
+    if not full:
+        # A stat is cheaper than handing it to another thread
+        return all(verify_file(vendor_dir, name, size, digest, False) for name, (size, digest) in files)
+    checks = [
+        pool.submit(verify_file, vendor_dir, name, size, digest, True)
+        for name, (size, digest) in files
+    ]
+    return all(check.result() for check in checks)
+
+
+def remove_files(vendor_dir: Path, names):
+    """Remove installed files, ignoring those already gone"""
+    for name in names:
+        (vendor_dir / name).unlink(missing_ok=True)
+
+
+def install_package(
+    cache: ArtifactCache,
+    package: Package,
+    vendor_dir: Path,
+    position: int = 0,
+    previous: dict | None = None,
+):
+    """Fetch a package, unpack it into vendor_dir and return its manifest entry"""
+    artifact = cache.fetch(package.url, package.sha256, position)
+    if package.url.endswith(".zip"):
+        # Extracted straight from the cached artifact, no temporary copy
+        with ZipFile(artifact) as zip_file:
+            names = [info.filename for info in zip_file.infolist() if not info.is_dir()]
+            zip_file.extractall(vendor_dir)
+        print(f"{package.name} extracted to {vendor_dir}")
+    else:
+        names = [f"{package.name}.js"]
+        copyfile(artifact, vendor_dir / names[0])
+        print(f"{package.name} saved to {vendor_dir / names[0]}")
+    if previous is not None:
+        remove_files(vendor_dir, set(previous["files"]) - set(names))
+    return {
+        "url": package.url,
+        "version": package.version,
+        # Cached artifacts are named after their verified hash
+        "sha256": artifact.name,
+        "files": {
+            name: [(vendor_dir / name).stat().st_size, hash_file(vendor_dir / name)]
+            for name in names
+        },
+    }
+
+
+def install_webui_dependency(
+    force=False,
+    packages: tuple[Package, ...] = PACKAGES,
+    vendor_dir: Path = VENDOR_DIR,
+    cache: ArtifactCache | None = None,
+):
+    """Install Web UI dependencies.
+
+    Only packages whose URL/version changed, or whose files are missing or
+    altered, are installed again; files no longer shipped are removed. With
+    force, installed files are verified by hash instead of size."""
+    vendor_dir.mkdir(parents=True, exist_ok=True)
+    installed = load_manifest(vendor_dir)
+    wanted = {package.name: package for package in packages}
+    changed = False
+
+    for name in set(installed) - set(wanted):
+        remove_files(vendor_dir, installed.pop(name)["files"])
+        print(f"{name} removed")
+        changed = True
+
+    pending = [
+        package
+        for package in packages
+        if (entry := installed.get(package.name)) is None
+        or (entry["url"], entry["version"]) != (package.url, package.version)
+    ]
+    with ThreadPoolExecutor() as pool:
+        pending.extend(
+            package
+            for package in packages
+            if package not in pending
+            and not verify_package(pool, vendor_dir, installed[package.name], force)
+        )
 
-    print("All dependencies installed in data/vendor/")
+    if pending:
+        cache = cache or ArtifactCache()
+        with ThreadPoolExecutor(max_workers=len(pending)) as pool:
+            futures = {
+                package.name: pool.submit(
+                    install_package,
+                    cache,
+                    package,
+                    vendor_dir,
+                    position,
+                    installed.get(package.name),
+                )
+                for position, package in enumerate(pending)
+            }
+            wait(futures.values())
+        # Keep whatever did arrive, even if another package failed
+        cache.save()
+        for name, future in futures.items():
+            if future.exception() is None:
+                installed[name] = future.result()
+        save_manifest(vendor_dir, installed)
+        for future in futures.values():
+            future.result()
+    elif changed:
+        save_manifest(vendor_dir, installed)
+    if pending or changed:
+        print(f"All dependencies installed in {vendor_dir}/")
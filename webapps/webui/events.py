@@ -0,0 +1,42 @@
+"""Events pushed to the Web UI"""
+import logging
+from json import dumps
+from threading import Lock
+from typing import Any
+
+
+class Broadcaster:
+    """Dispatch DOM CustomEvents on every attached window"""
+
+    def __init__(self) -> None:
+        self._windows: list = []
+        self._lock = Lock()
+
+    def attach(self, window):
+        """Start pushing events to a pywebview window, until it is closed"""
+        with self._lock:
+            self._windows.append(window)
+        window.events.closed += lambda: self.detach(window)
+
+    def detach(self, window):
+        """Stop pushing events to a window"""
+        with self._lock:
+            if window in self._windows:
+                self._windows.remove(window)
+
+    def emit(self, name: str, detail: Any):
+        """Dispatch a CustomEvent named name, with a JSON-able detail, on window"""
+        with self._lock:
+            windows = list(self._windows)
+        if not windows:
+            return
+        event = f"new CustomEvent({dumps(name)}, {{detail: {dumps(detail)}}})"
+        script = f"window.dispatchEvent({event})"
+        for window in windows:
+            try:
+                window.evaluate_js(script)
+            except Exception:  # pylint: disable=broad-exception-caught
+                logging.exception("Couldn't push %s", name)
+
+
+EVENTS = Broadcaster()
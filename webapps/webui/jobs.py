@@ -0,0 +1,378 @@
+"""Background jobs"""
+import errno
+import logging
+import os
+import re
+import shutil
+import stat
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from pathlib import Path
+from tempfile import mkdtemp
+from threading import Event, Lock
+from typing import Any, Callable
+
+from .events import EVENTS
+from ..profiles import CONFIG_DIR
+from ..storage import CACHE_DIRS
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+STAGING_DIR = CONFIG_DIR / "staging"
+TRASH_DIR = CONFIG_DIR / "trash"
+CHUNK_SIZE = 1 << 20
+FICLONE = 0x40049409
+NO_REFLINK = (errno.EOPNOTSUPP, errno.EXDEV, errno.EINVAL, errno.ENOTTY, errno.ENOSYS)
+PUSH_INTERVAL = 0.2
+# Chromium simple cache entries, written once and replaced rather than modified.
+# The index and block-file caches (index, data_0...) are rewritten in place
+SIMPLE_CACHE_ENTRY = re.compile(r"[0-9a-f]{16}_[01]")
+# WebKit blob files, never modified once written
+BLOB_DIR = "Blobs"
+
+
+class Cancelled(Exception):
+    """Raised inside a job once it is cancelled"""
+
+
+class Job:
+    """A unit of background work, with progress in bytes and files"""
+
+    def __init__(self, job_id: str, kind: str, target: str) -> None:
+        self.id = job_id
+        self.kind = kind
+        self.target = target
+        self.state = "queued"
+        self.bytes_done = 0
+        self.bytes_total = 0
+        self.files_done = 0
+        self.files_total = 0
+        self.error: str | None = None
+        self.result: Any = None
+        self._cancellable = True
+        self._cancelled = Event()
+        self._lock = Lock()
+        self._pushed = 0.0
+
+    def status(self):
+        """Return the JSON-able state of this job"""
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "target": self.target,
+            "state": self.state,
+            "bytes_done": self.bytes_done,
+            "bytes_total": self.bytes_total,
+            "files_done": self.files_done,
+            "files_total": self.files_total,
+            "error": self.error,
+            "result": self.result,
+        }
+
+    def cancel(self) -> bool:
+        """Ask the job to stop, return whether it still can"""
+        with self._lock:
+            if self.state not in ("queued", "running") or not self._cancellable:
+                return False
+            self._cancelled.set()
+            return True
+
+    def commit(self):
+        """Stop here if cancelled, otherwise the job can't be cancelled from now on"""
+        with self._lock:
+            self.check()
+            self._cancellable = False
+
+    def check(self):
+        """Raise Cancelled if the job was cancelled"""
+        if self._cancelled.is_set():
+            raise Cancelled()
+
+    def push(self, force: bool = False):
+        """Push the status to the UI, at most every PUSH_INTERVAL unless forced"""
+        now = time.monotonic()
+        if force or now - self._pushed >= PUSH_INTERVAL:
+            self._pushed = now
+            EVENTS.emit("job-progress", self.status())
+
+    def advance(self, size: int = 0, files: int = 0):
+        """Record progress, then stop here if cancelled"""
+        self.bytes_done += size
+        self.files_done += files
+        self.push()
+        self.check()
+
+
+class JobQueue:
+    """Bounded worker pool for jobs, keeping the last finished ones for status queries"""
+
+    def __init__(self, max_workers: int = 2, keep: int = 100) -> None:
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._keep = keep
+        self._ids = count(1)
+        self._lock = Lock()
+
+    def submit(self, kind: str, target: str, function: Callable[..., Any], *args) -> str:
+        """Queue function(job, *args), return the job id"""
+        with self._lock:
+            job = Job(f"{kind}-{next(self._ids)}", kind, target)
+            self._jobs[job.id] = job
+            finished = [
+                key for key, item in self._jobs.items() if item.state not in ("queued", "running")
+            ]
+            for key in finished[: max(len(finished) - self._keep, 0)]:
+                del self._jobs[key]
+        self._pool.submit(self._run, job, function, args)
+        job.push(True)
+        return job.id
+
+    @staticmethod
+    def _run(job: Job, function: Callable[..., Any], args):
+        try:
+            job.check()
+            job.state = "running"
+            job.push(True)
+            job.result = function(job, *args)
+            job.state = "done"
+        except Cancelled:
+            job.state = "cancelled"
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            logging.exception("Job %s failed", job.id)
+            job.state = "failed"
+            job.error = str(error)
+        job.push(True)
+
+    def get(self, job_id: str) -> Job:
+        """Return a job by id"""
+        with self._lock:
+            return self._jobs[job_id]
+
+    def jobs(self):
+        """Return the status of every known job, oldest first"""
+        with self._lock:
+            return [job.status() for job in self._jobs.values()]
+
+
+def _file_size(path: str) -> int:
+    """Size of a regular file, 0 for anything else"""
+    try:
+        status = os.lstat(path)
+    except FileNotFoundError:
+        return 0
+    return status.st_size if stat.S_ISREG(status.st_mode) else 0
+
+
+def measure(job: Job, path: Path, skip: frozenset[str] = frozenset()):
+    """Count files and bytes under path into the job totals, leaving out directories in skip"""
+    for root, dirs, files in os.walk(path):
+        dirs[:] = [name for name in dirs if name not in skip]
+        job.files_total += len(files) + len(dirs)
+        for name in files:
+            job.bytes_total += _file_size(os.path.join(root, name))
+        job.check()
+
+
+def copy_file(job: Job, source: str, destination: str):
+    """Copy a file with its metadata, chunk by chunk"""
+    with open(source, "rb") as reader, open(destination, "wb") as writer:
+        while chunk := reader.read(CHUNK_SIZE):
+            writer.write(chunk)
+            job.advance(len(chunk))
+    shutil.copystat(source, destination)
+    job.advance(files=1)
+
+
+def write_once(parts: tuple[str, ...], name: str) -> bool:
+    """Whether the file name under the relative directory parts is never modified in place"""
+    if BLOB_DIR in parts:
+        return True
+    return not CACHE_DIRS.isdisjoint(parts) and SIMPLE_CACHE_ENTRY.fullmatch(name) is not None
+
+
+def clone_file(source: str, destination: str) -> bool:
+    """Make destination a copy-on-write clone of source, return False if the filesystem can't"""
+    if fcntl is None or not sys.platform.startswith("linux"):
+        return False
+    with open(source, "rb") as reader, open(destination, "wb") as writer:
+        try:
+            fcntl.ioctl(writer.fileno(), FICLONE, reader.fileno())
+        except OSError as error:
+            if error.errno not in NO_REFLINK:
+                raise
+            cloned = False
+        else:
+            cloned = True
+    if not cloned:
+        os.unlink(destination)
+        return False
+    shutil.copystat(source, destination)
+    return True
+
+
+class TreeCopy:
+    """Copy of a directory tree, sharing data with the source where it is safe.
+
+    Files are reflinked where the filesystem supports it. Failing that,
+    files known to be written once (see write_once) are hardlinked, and
+    everything else is copied byte by byte: both profiles' browsers would
+    otherwise write to the same cache index. With skip_cache, cache
+    directories are left out."""
+
+    def __init__(self, job: Job, skip_cache: bool = False) -> None:
+        self._job = job
+        self._skip = CACHE_DIRS if skip_cache else frozenset()
+        self._reflink = True
+        self.stats = {
+            "copied": 0,
+            "shared": 0,
+            "reflinked_files": 0,
+            "hardlinked_files": 0,
+            "copied_files": 0,
+            "skipped_dirs": 0,
+        }
+
+    def _file(self, source: str, destination: str, shareable: bool):
+        size = _file_size(source)
+        if self._reflink:
+            if clone_file(source, destination):
+                self.stats["shared"] += size
+                self.stats["reflinked_files"] += 1
+                self._job.advance(size, 1)
+                return
+            # Same filesystem for the whole copy, no need to try again
+            self._reflink = False
+        if shareable:
+            try:
+                os.link(source, destination)
+            except OSError:
+                pass
+            else:
+                self.stats["shared"] += size
+                self.stats["hardlinked_files"] += 1
+                self._job.advance(size, 1)
+                return
+        copy_file(self._job, source, destination)
+        self.stats["copied"] += size
+        self.stats["copied_files"] += 1
+
+    def copy(self, source: Path, destination: Path):
+        """Copy source to destination, removing the copy if cancelled or failed"""
+        measure(self._job, source, self._skip)
+        try:
+            for root, dirs, files in os.walk(source):
+                relative = os.path.relpath(root, source)
+                target = os.path.join(destination, relative)
+                parts = Path(relative).parts
+                os.makedirs(target, exist_ok=True)
+                kept = []
+                for name in dirs:
+                    if name in self._skip:
+                        self.stats["skipped_dirs"] += 1
+                        continue
+                    kept.append(name)
+                    path = os.path.join(root, name)
+                    if os.path.islink(path):
+                        os.symlink(os.readlink(path), os.path.join(target, name))
+                    self._job.advance(files=1)
+                dirs[:] = kept
+                for name in files:
+                    path = os.path.join(root, name)
+                    if os.path.islink(path):
+                        os.symlink(os.readlink(path), os.path.join(target, name))
+                        self._job.advance(files=1)
+                    else:
+                        self._file(path, os.path.join(target, name), write_once(parts, name))
+                shutil.copystat(root, target)
+        except BaseException:
+            shutil.rmtree(destination, ignore_errors=True)
+            raise
+        return self.stats
+
+
+def copy_tree(job: Job, source: Path, destination: Path, skip_cache: bool = False):
+    """Copy a directory like shutil.copytree, reporting progress and removing the copy if cancelled.
+
+    Returns how many bytes were copied and how many are shared with the source."""
+    return TreeCopy(job, skip_cache).copy(source, destination)
+
+
+def remove_tree(job: Job, path: Path):
+    """Remove a directory bottom-up, reporting progress"""
+    for root, dirs, files in os.walk(path, topdown=False):
+        for name in files:
+            entry = os.path.join(root, name)
+            size = _file_size(entry)
+            try:
+                os.unlink(entry)
+            except FileNotFoundError:
+                pass
+            job.advance(size, 1)
+        for name in dirs:
+            entry = os.path.join(root, name)
+            if os.path.islink(entry):
+                os.unlink(entry)
+            else:
+                os.rmdir(entry)
+            job.advance(files=1)
+    os.rmdir(path)
+
+
+def work_dir(parent: Path) -> Path:
+    """New directory under parent, named after this process so others leave it alone"""
+    parent.mkdir(parents=True, exist_ok=True)
+    return Path(mkdtemp(prefix=f"{os.getpid()}-", dir=parent))
+
+
+def _owner_alive(name: str) -> bool:
+    """Whether the process a work directory is named after still runs"""
+    pid, dash, _ = name.partition("-")
+    if not dash or not pid.isdigit():
+        # Made before directories were named after their owner
+        return False
+    if int(pid) == os.getpid() or os.name == "nt":
+        # os.kill would terminate it on Windows: keep what may still be in use
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def delete_directory(job: Job, path: Path):
+    """Move a directory to the trash at once, then remove it there"""
+    measure(job, path)
+    trash = work_dir(TRASH_DIR)
+    # Once the directory is gone from its place, there's nothing to cancel anymore
+    job.commit()
+    path.replace(trash / path.name)
+    job.files_total += 1
+    remove_tree(job, trash)
+
+
+def purge_leftovers(job: Job):
+    """Remove what interrupted copies and deletions left behind.
+
+    Directories of processes still running, this one included, are theirs to finish."""
+    job.commit()
+    for directory in (STAGING_DIR, TRASH_DIR):
+        if not directory.exists():
+            continue
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if _owner_alive(entry.name):
+                    continue
+                measure(job, Path(entry.path))
+                remove_tree(job, Path(entry.path))
+
+
+JOBS = JobQueue()
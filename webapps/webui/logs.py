@@ -4,14 +4,18 @@ from atexit import register
 import logging
 import logging.config
 from yaml import safe_load
-from ..profiles import CONFIG_DIR, SELF
+from ..profiles import CONFIG_DIR, SELF, ensure_dirs
 
 LOG_DIR = CONFIG_DIR / "logs"
 LOG_CONFIG = CONFIG_DIR / "logs.yaml"
-SELF_DIR = SELF / '..'
+SELF_DIR = SELF.parent
 
 def setup_logging():
     """Setup logging"""
+    if not LOG_CONFIG.exists():
+        ensure_dirs()
+        with open(SELF_DIR / 'webapps' / 'webui' / 'example_logs.yaml', encoding='utf-8') as f:
+            LOG_CONFIG.write_text(f.read())
     config_file = Path(LOG_CONFIG)
     with open(config_file, encoding='utf-8') as f_in:
         config = safe_load(f_in)
@@ -21,7 +25,3 @@ def setup_logging():
     if queue_handler is not None:
         queue_handler.listener.start()
         register(queue_handler.listener.stop)
-
-if not LOG_CONFIG.exists():
-    with open(SELF_DIR / 'webapps' / 'webui' / 'example_logs.yaml', encoding='utf-8') as f:
-        LOG_CONFIG.write_text(f.read())
@@ -0,0 +1,177 @@
+"""Per-call metrics of the JS API"""
+import inspect
+import logging
+import time
+import types
+from atexit import register
+from bisect import bisect_left
+from collections import deque
+from json import dumps
+from threading import Event, Lock, Thread
+from typing import Any, Callable
+
+from .logs import LOG_DIR
+
+# Upper bounds of the latency buckets: 10µs to about 10s, √2 apart
+BUCKETS = tuple(1e-5 * 2 ** (index / 2) for index in range(41))
+DUMP_FILE = LOG_DIR / "api-metrics.jsonl"
+DUMP_INTERVAL = 60.0
+
+
+def _size(value: Any) -> int:
+    """Size of value as JSON, as it crosses the bridge"""
+    try:
+        return len(dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+class MethodStats:
+    """Aggregated calls of one method"""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.errors: dict[str, int] = {}
+        self.histogram = [0] * (len(BUCKETS) + 1)
+
+    def add(self, latency: float, size_in: int, size_out: int, error: str | None):
+        """Count one call"""
+        self.calls += 1
+        self.total += latency
+        self.slowest = max(self.slowest, latency)
+        self.bytes_in += size_in
+        self.bytes_out += size_out
+        if error is not None:
+            self.errors[error] = self.errors.get(error, 0) + 1
+        self.histogram[bisect_left(BUCKETS, latency)] += 1
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding that fraction of the calls (at most the slowest one)"""
+        wanted = fraction * self.calls
+        seen = 0
+        for index, count in enumerate(self.histogram):
+            seen += count
+            if count and seen >= wanted:
+                bound = BUCKETS[index] if index < len(BUCKETS) else self.slowest
+                return min(bound, self.slowest)
+        return 0.0
+
+    def summary(self) -> dict[str, Any]:
+        """JSON-able statistics, latencies in milliseconds"""
+        return {
+            "calls": self.calls,
+            "errors": dict(self.errors),
+            "mean_ms": self.total / self.calls * 1000 if self.calls else 0.0,
+            "p50_ms": self.percentile(0.5) * 1000,
+            "p95_ms": self.percentile(0.95) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "max_ms": self.slowest * 1000,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+        }
+
+
+class Metrics:
+    """In-memory store of API calls.
+
+    Calls append to a deque, which needs no lock; they are folded into
+    per-method statistics only when someone reads them."""
+
+    def __init__(self) -> None:
+        self._events: deque = deque()
+        self._stats: dict[str, MethodStats] = {}
+        self._lock = Lock()
+        self._stop = Event()
+        self._dumped = 0
+        self.enabled = False
+
+    def record(self, method: str, latency: float, size_in: int, size_out: int, error=None):
+        """Record one call"""
+        self._events.append((method, latency, size_in, size_out, error))
+
+    def _drain(self):
+        """Fold pending calls into the statistics. Call with lock held"""
+        while self._events:
+            method, *call = self._events.popleft()
+            stats = self._stats.get(method)
+            if stats is None:
+                stats = self._stats[method] = MethodStats()
+            stats.add(*call)
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """Statistics of every called method"""
+        with self._lock:
+            self._drain()
+            return {method: stats.summary() for method, stats in sorted(self._stats.items())}
+
+    def dump(self, path=DUMP_FILE):
+        """Append a snapshot to a JSONL file, if there were calls since the last one"""
+        with self._lock:
+            self._drain()
+            calls = sum(stats.calls for stats in self._stats.values())
+            if calls == self._dumped:
+                return
+            self._dumped = calls
+            methods = {method: stats.summary() for method, stats in sorted(self._stats.items())}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as file:
+            file.write(dumps({"time": time.time(), "methods": methods}) + "\n")
+
+    def start(self, interval: float = DUMP_INTERVAL):
+        """Dump every interval seconds from a daemon thread, and at exit"""
+        self.enabled = True
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.dump()
+                except OSError:
+                    logging.exception("Couldn't dump API metrics")
+
+        Thread(target=run, name="metrics", daemon=True).start()
+        register(self.dump)
+        return self
+
+
+METRICS = Metrics()
+
+
+def _timed(function: Callable, method: str, metrics: Metrics):
+    def call(self, *args, **kwargs):
+        size_in = _size([args, kwargs] if kwargs else args)
+        begin = time.perf_counter()
+        try:
+            result = function(self, *args, **kwargs)
+        except Exception as error:
+            metrics.record(method, time.perf_counter() - begin, size_in, 0, type(error).__name__)
+            raise
+        metrics.record(method, time.perf_counter() - begin, size_in, _size(result))
+        return result
+
+    call.__name__ = function.__name__
+    call.__doc__ = function.__doc__
+    # pywebview reads the parameter names for its JS stubs
+    call.__signature__ = inspect.signature(function)
+    return call
+
+
+def instrument(obj: object, prefix: str = "", metrics: Metrics = METRICS):
+    """Time every public method of obj, as called through this instance"""
+    kind = type(obj)
+    for name in dir(kind):
+        if name.startswith("_") or not inspect.isfunction(inspect.getattr_static(kind, name)):
+            continue
+        timed = _timed(getattr(kind, name), prefix + name, metrics)
+        setattr(obj, name, types.MethodType(timed, obj))
+    return obj
+
+
+def instrument_api(api) -> None:
+    """Time the Web UI API and each of its sub-APIs"""
+    instrument(api)
+    for name in ("webview", "os", "config"):
+        instrument(getattr(api, name), f"{name}.")
@@ -0,0 +1,66 @@
+"""SQLite connection layer"""
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock, local
+
+PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA mmap_size = 33554432",
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+class Store:
+    """Per-thread sqlite3 connections to a single WAL-mode database"""
+
+    def __init__(self, path: Path, timeout: float = 10.0, cached_statements: int = 64) -> None:
+        self._path = path
+        self._timeout = timeout
+        self._cached_statements = cached_statements
+        self._local = local()
+        # Shared by every thread, behind _watch_lock
+        self._watch = self._connect(check_same_thread=False)
+        self._watch.execute("PRAGMA journal_mode = WAL")
+        self._watch_lock = Lock()
+
+    def _connect(self, check_same_thread: bool = True):
+        conn = sqlite3.connect(
+            self._path,
+            timeout=self._timeout,
+            isolation_level=None,
+            check_same_thread=check_same_thread,
+            cached_statements=self._cached_statements,
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Return the connection of the calling thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def execute(self, sql: str, parameters=()):
+        """Run a single statement on the calling thread's connection"""
+        return self.connection().execute(sql, parameters)
+
+    @contextmanager
+    def transaction(self):
+        """Write transaction, taking the write lock up front so it never fails to upgrade"""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def data_version(self) -> int:
+        """Changes whenever any other connection, in or out of this process, commits"""
+        with self._watch_lock:
+            return self._watch.execute("PRAGMA data_version").fetchone()[0]
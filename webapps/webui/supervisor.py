@@ -0,0 +1,313 @@
+"""Supervisor of launched profiles"""
+import logging
+import os
+import select
+import signal
+import time
+from subprocess import DEVNULL, STDOUT, Popen
+from json import dumps
+from threading import Lock, Thread
+from typing import Any
+
+from .events import EVENTS
+from .traces import TRACES
+from .. import host, launcher
+from ..profiles import SELF
+from ..tracing import TRACE_ENV
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+POLL_INTERVAL = 1.0
+
+
+class App:
+    """A launched profile"""
+
+    def __init__(
+        self,
+        name: str,
+        private: bool,
+        pid: int,
+        process: Popen | None,
+        host_key: str | None = None,
+    ) -> None:
+        self.name = name
+        self.private = private
+        self.pid = pid
+        # Set when the app is our own child, None when the launcher daemon forked it
+        self.process = process
+        # Set when the app is a window of a shared host, which pid is then
+        self.host_key = host_key
+        self.closed = False
+        self.started = time.time()
+        self.pidfd: int | None = None
+        # Tells pid from a recycled one where there is no pidfd, None without /proc
+        self.start_time = _start_time(pid)
+
+    def alive(self) -> bool:
+        """Whether the app still runs, reaping it if it is our child.
+
+        A window of a shared host is gone once the user closed it, even
+        while the host keeps running for other windows."""
+        if self.closed or not self._running():
+            return False
+        if self.host_key is None:
+            return True
+        reply = host.request(self.host_key, {"windows": self.name})
+        # No reply while the host is still starting up
+        return reply is None or reply.get("windows", 1) > 0
+
+    def same_process(self) -> bool:
+        """Whether pid still is the launched process, not a recycled pid"""
+        if self.process is not None:
+            return self.process.poll() is None
+        return self.start_time is None or _start_time(self.pid) == self.start_time
+
+    def _running(self) -> bool:
+        if self.process is not None:
+            return self.process.poll() is None
+        if not self.same_process():
+            return False
+        try:
+            os.kill(self.pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return not _is_zombie(self.pid)
+
+
+def _stat(pid: int) -> list[str] | None:
+    """Fields of /proc/<pid>/stat from the state on, None where unavailable"""
+    try:
+        with open(f"/proc/{pid}/stat", encoding="utf-8") as file:
+            # The command name may contain spaces and parentheses
+            return file.read().rpartition(")")[2].split()
+    except OSError:
+        return None
+
+
+def _is_zombie(pid: int) -> bool:
+    fields = _stat(pid)
+    return fields is not None and fields[0] == "Z"
+
+
+def _start_time(pid: int) -> int | None:
+    """Clock ticks from boot to the start of a process"""
+    fields = _stat(pid)
+    return None if fields is None else int(fields[19])
+
+
+def process_stats(pid: int) -> dict[str, Any]:
+    """Return RSS and CPU seconds of a process from /proc, empty where unavailable"""
+    fields = _stat(pid)
+    if fields is None:
+        return {}
+    return {
+        "cpu": (int(fields[11]) + int(fields[12])) / CLOCK_TICKS,
+        "rss": int(fields[21]) * PAGE_SIZE,
+    }
+
+
+class Supervisor:
+    """Launches profiles and keeps track of them until they exit.
+
+    Exits are noticed through pidfds where available (Linux 5.3+), by
+    polling otherwise; our own children are reaped as soon as they exit."""
+
+    def __init__(self) -> None:
+        # id(app) -> app, several windows of a shared host have the same pid
+        self._apps: dict[int, App] = {}
+        self._lock = Lock()
+        self._wake_r, self._wake_w = os.pipe() if hasattr(os, "pidfd_open") else (None, None)
+        self._thread: Thread | None = None
+
+    def _watch(self, app: App):
+        if self._wake_w is not None:
+            try:
+                app.pidfd = os.pidfd_open(app.pid)
+            except OSError:
+                app.pidfd = None
+        with self._lock:
+            self._apps[id(app)] = app
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name="supervisor", daemon=True)
+                self._thread.start()
+        if self._wake_w is not None:
+            os.write(self._wake_w, b"\0")
+
+    def _run(self):
+        while True:
+            with self._lock:
+                fds = {app.pidfd: app for app in self._apps.values() if app.pidfd is not None}
+                # Closing a window of a shared host doesn't show on its pidfd
+                polled = any(
+                    app.pidfd is None or app.host_key is not None for app in self._apps.values()
+                )
+            if self._wake_r is None:
+                time.sleep(POLL_INTERVAL)
+            else:
+                timeout = POLL_INTERVAL if polled else None
+                ready, _, _ = select.select([self._wake_r, *fds], [], [], timeout)
+                if self._wake_r in ready:
+                    os.read(self._wake_r, 4096)
+            self._reap()
+
+    def _reap(self):
+        # Only called from the supervisor thread, which owns the pidfds
+        with self._lock:
+            apps = list(self._apps.values())
+        exited = [app for app in apps if not app.alive()]
+        if not exited:
+            return
+        with self._lock:
+            for app in exited:
+                self._apps.pop(id(app), None)
+                if app.pidfd is not None:
+                    os.close(app.pidfd)
+                    app.pidfd = None
+        for app in exited:
+            logging.debug("%s (%d) exited", app.name, app.pid)
+        EVENTS.emit("apps-changed", self.running_apps())
+
+    @staticmethod
+    def _shared(name: str, private: bool, trace: dict | None) -> App | None:
+        key = host.key_of(name, private)
+        if key is None:
+            return None
+        message = {"name": name, "private": private}
+        if trace is not None:
+            message["trace"] = trace
+        reply = host.request(key, message)
+        if reply is None:
+            process = host.spawn([name], private, trace)
+            return App(name, private, process.pid, process, key)
+        if reply.get("error"):
+            logging.warning(reply["error"])
+            return None
+        return App(name, private, reply["pid"], None, key)
+
+    def spawn(self, name: str, private: bool = False, shared: bool = False) -> int:
+        """Launch a profile, through the launcher daemon if it runs, and return its pid.
+
+        With shared, the profile opens as a window of a shared host, which is
+        started if none can take it. Returns 0 if it couldn't be tracked.
+        The launch is traced when the trace collector runs."""
+        trace = TRACES.context(name, private)
+        if shared:
+            app = self._shared(name, private, trace)
+        elif (reply := launcher.request(name, private, wait=False, trace=trace)) is not None:
+            app = App(name, private, reply["pid"], None) if reply.get("pid") else None
+        else:
+            command = ["python", SELF, "run", name, "--cold"]
+            if private:
+                command.insert(4, "--private")
+            env = None if trace is None else {**os.environ, TRACE_ENV: dumps(trace)}
+            # pylint: disable=consider-using-with
+            process = Popen(
+                command, start_new_session=True, stdout=DEVNULL, stderr=STDOUT, env=env
+            )
+            app = App(name, private, process.pid, process)
+        if app is None:
+            return 0
+        self._watch(app)
+        EVENTS.emit("apps-changed", self.running_apps())
+        return app.pid
+
+    def running_apps(self) -> list[dict[str, Any]]:
+        """Return pid, uptime (s), RSS (bytes) and CPU time (s) of every running profile"""
+        now = time.time()
+        with self._lock:
+            apps = list(self._apps.values())
+        running = []
+        for app in apps:
+            stats = process_stats(app.pid)
+            running.append(
+                {
+                    "name": app.name,
+                    "private": app.private,
+                    "pid": app.pid,
+                    "shared": app.host_key is not None,
+                    "uptime": now - app.started,
+                    "rss": stats.get("rss"),
+                    "cpu": stats.get("cpu"),
+                }
+            )
+        return running
+
+    def _apps_of(self, name: str):
+        with self._lock:
+            apps = [app for app in self._apps.values() if app.name == name]
+        # Leaving out those gone since the last reap, like windows the user just closed
+        return [app for app in apps if app.alive()]
+
+    def _signal(self, app: App, kill: bool = False):
+        if not hasattr(os, "killpg"):
+            if app.process is not None:
+                app.process.kill() if kill else app.process.terminate()
+            return
+        signum = signal.SIGKILL if kill else signal.SIGTERM
+        # Held so the reaper can't close the pidfd meanwhile
+        with self._lock:
+            if app.pidfd is not None:
+                try:
+                    signal.pidfd_send_signal(app.pidfd, signum)
+                except ProcessLookupError:
+                    return
+            elif not app.same_process():
+                # The pid may belong to an unrelated process by now
+                return
+            # Each app leads its own session, take its helper processes down with it
+            try:
+                os.killpg(app.pid, signum)
+            except (ProcessLookupError, PermissionError):
+                try:
+                    os.kill(app.pid, signum)
+                except ProcessLookupError:
+                    pass
+
+    def _wait(self, apps: list[App], timeout: float) -> list[App]:
+        """Wait for every app at once, return those still alive at the deadline"""
+        deadline = time.monotonic() + timeout
+        pending = [app for app in apps if app.alive()]
+        while pending and time.monotonic() < deadline:
+            time.sleep(0.05)
+            pending = [app for app in pending if app.alive()]
+        return pending
+
+    def stop(self, name: str, timeout: float = 5.0) -> int:
+        """Stop every instance of a profile, killing those still alive after timeout.
+
+        Returns how many were stopped."""
+        apps = self._apps_of(name)
+        alone = [app for app in apps if app.host_key is None]
+        for app in apps:
+            if app.host_key is None:
+                self._signal(app)
+            else:
+                # Only close its windows, the host keeps serving the others
+                host.request(app.host_key, {"close": name})
+                app.closed = True
+        for app in self._wait(alone, timeout):
+            self._signal(app, kill=True)
+        if self._wake_w is not None:
+            os.write(self._wake_w, b"\0")
+        return len(apps)
+
+    def restart(self, name: str, timeout: float = 5.0) -> list[int]:
+        """Stop every instance of a profile and start them again, return the new pids"""
+        apps = self._apps_of(name)
+        self.stop(name, timeout)
+        return [self.spawn(name, app.private, app.host_key is not None) for app in apps]
+
+    def shutdown(self, timeout: float = 2.0, terminate: bool = False):
+        """Give every app one shared timeout to exit, optionally asking them to first"""
+        with self._lock:
+            apps = list(self._apps.values())
+        if terminate:
+            for app in apps:
+                self._signal(app)
+        self._wait(apps, timeout)
+
+
+SUPERVISOR = Supervisor()
@@ -0,0 +1,202 @@
+"""Launch traces: collected from launched profiles, kept in config.db"""
+import logging
+import math
+import os
+import socket
+import sqlite3
+import time
+from json import dumps, loads
+from threading import Lock, Thread
+from typing import Any
+from uuid import uuid4
+
+from .events import EVENTS
+from .store import Store
+from ..profiles import CONFIG_DIR, ensure_dirs
+from ..tracing import PHASES
+
+TRACE_SOCKET = CONFIG_DIR / "traces.sock"
+# Traces kept per profile, older ones are dropped
+KEEP = 200
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS launch_traces (id TEXT PRIMARY KEY, profile TEXT, "
+    "private INTEGER, started REAL, phases TEXT, total REAL, error TEXT)",
+    "CREATE INDEX IF NOT EXISTS launch_traces_profile ON launch_traces (profile, started)",
+)
+PRUNE = (
+    "DELETE FROM launch_traces WHERE profile = ? AND id NOT IN "
+    "(SELECT id FROM launch_traces WHERE profile = ? ORDER BY started DESC LIMIT ?)"
+)
+
+
+def durations(marks: dict[str, float]) -> dict[str, float]:
+    """Seconds each phase took, from the previous phase stamped"""
+    phases = {}
+    previous = None
+    for phase in PHASES:
+        if phase not in marks:
+            continue
+        if previous is not None:
+            phases[phase] = marks[phase] - previous
+        previous = marks[phase]
+    return phases
+
+
+def _distribution(samples: list[float]) -> dict[str, float]:
+    """p50, p95 and max of samples (s) in milliseconds, nearest rank"""
+    if not samples:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+    ordered = sorted(samples)
+
+    def rank(fraction):
+        return ordered[max(0, math.ceil(len(ordered) * fraction) - 1)] * 1000
+
+    return {"p50_ms": rank(0.5), "p95_ms": rank(0.95), "max_ms": ordered[-1] * 1000}
+
+
+class LaunchHistory:
+    """The last KEEP launch traces of each profile"""
+
+    def __init__(self, keep: int = KEEP) -> None:
+        ensure_dirs()
+        self._store = Store(CONFIG_DIR / "config.db")
+        self._keep = keep
+        for statement in SCHEMA:
+            self._store.execute(statement)
+
+    def add(self, trace: dict[str, Any]) -> dict[str, Any]:
+        """Store a trace as reported by a launched profile, return its history entry"""
+        marks = trace["marks"]
+        entry = {
+            "id": trace["id"],
+            "profile": trace["profile"],
+            "private": bool(trace.get("private")),
+            "started": marks["spawn"],
+            "phases": durations(marks),
+            "total": max(marks.values()) - marks["spawn"],
+            "error": trace.get("error"),
+        }
+        with self._store.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO launch_traces VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    entry["id"],
+                    entry["profile"],
+                    entry["private"],
+                    entry["started"],
+                    dumps(entry["phases"]),
+                    entry["total"],
+                    entry["error"],
+                ),
+            )
+            conn.execute(PRUNE, (entry["profile"], entry["profile"], self._keep))
+        return entry
+
+    def history(self, name: str, limit: int = 50) -> list[dict[str, Any]]:
+        """Latest traces of a profile, newest first. Durations in seconds"""
+        rows = self._store.execute(
+            "SELECT * FROM launch_traces WHERE profile = ? ORDER BY started DESC LIMIT ?",
+            (name, limit),
+        ).fetchall()
+        return [
+            {**dict(row), "private": bool(row["private"]), "phases": loads(row["phases"])}
+            for row in rows
+        ]
+
+    def report(self, names: list[str] | None = None) -> dict[str, dict[str, Any]]:
+        """Per profile: launch count, errors, and the distribution of the total and each phase.
+
+        Failed launches are counted but left out of the distributions."""
+        if names:
+            marks = ", ".join("?" * len(names))
+            rows = self._store.execute(
+                f"SELECT * FROM launch_traces WHERE profile IN ({marks})", tuple(names)
+            ).fetchall()
+        else:
+            rows = self._store.execute("SELECT * FROM launch_traces").fetchall()
+        grouped: dict[str, list] = {}
+        for row in rows:
+            grouped.setdefault(row["profile"], []).append(row)
+        report = {}
+        for name, traces in sorted(grouped.items()):
+            succeeded = [row for row in traces if row["error"] is None]
+            phases = [loads(row["phases"]) for row in succeeded]
+            report[name] = {
+                "count": len(traces),
+                "errors": len(traces) - len(succeeded),
+                "total": _distribution([row["total"] for row in succeeded]),
+                "phases": {
+                    phase: _distribution([found[phase] for found in phases if phase in found])
+                    for phase in PHASES[1:]
+                    if any(phase in found for found in phases)
+                },
+            }
+        return report
+
+
+class TraceCollector:
+    """Receives the traces of launched profiles on a socket and stores them"""
+
+    def __init__(self) -> None:
+        self._history: LaunchHistory | None = None
+        self._server: socket.socket | None = None
+        self._lock = Lock()
+
+    @property
+    def history(self) -> LaunchHistory:
+        """Stored traces"""
+        with self._lock:
+            if self._history is None:
+                self._history = LaunchHistory()
+            return self._history
+
+    def start(self):
+        """Listen from a daemon thread, return self. No-op where unix sockets are missing"""
+        if not hasattr(socket, "AF_UNIX") or self._server is not None:
+            return self
+        ensure_dirs()
+        TRACE_SOCKET.unlink(missing_ok=True)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(str(TRACE_SOCKET))
+        os.chmod(TRACE_SOCKET, 0o600)
+        server.listen()
+        self._server = server
+        Thread(target=self._serve, args=(server,), name="traces", daemon=True).start()
+        return self
+
+    def _serve(self, server: socket.socket):
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            with conn, conn.makefile("r", encoding="utf-8") as stream:
+                conn.settimeout(2)
+                try:
+                    entry = self.history.add(loads(stream.readline()))
+                except (OSError, ValueError, KeyError, TypeError, sqlite3.Error):
+                    logging.exception("Couldn't store a launch trace")
+                    continue
+            EVENTS.emit("launch-traced", entry)
+
+    def context(self, name: str, private: bool = False) -> dict[str, Any] | None:
+        """Trace context to hand to a launch, stamped now. None when not collecting"""
+        if self._server is None:
+            return None
+        return {
+            "id": uuid4().hex,
+            "profile": name,
+            "private": private,
+            "socket": str(TRACE_SOCKET),
+            "spawned": time.time(),
+        }
+
+    def stop(self):
+        """Stop listening"""
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            TRACE_SOCKET.unlink(missing_ok=True)
+
+
+TRACES = TraceCollector()
@@ -0,0 +1,251 @@
+"""Profile directory watcher"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+from configparser import Error as ConfigError
+from pathlib import Path
+from threading import Event, Thread
+from typing import Any, Callable
+
+from .events import EVENTS
+from ..catalog import CATALOG
+from ..profiles import PROFILE_DIR, ensure_dirs
+from ..search import INDEX
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+ROOT_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ONLYDIR
+PROFILE_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE | IN_ONLYDIR
+INOTIFY_EVENT = struct.Struct("iIII")
+CONFIG_NAME = "config.conf"
+
+# Profile name -> (directory inode, (config mtime_ns, size) or None)
+Snapshot = dict[str, tuple[int, tuple[int, int] | None]]
+
+
+def scan(root: Path = PROFILE_DIR, names=None) -> Snapshot:
+    """Snapshot profiles under root, or only names"""
+    if names is None:
+        try:
+            with os.scandir(root) as entries:
+                names = [entry.name for entry in entries if entry.is_dir()]
+        except FileNotFoundError:
+            return {}
+    found: Snapshot = {}
+    for name in names:
+        path = os.path.join(root, name)
+        try:
+            inode = os.stat(path).st_ino
+        except FileNotFoundError:
+            continue
+        try:
+            stat = os.stat(os.path.join(path, CONFIG_NAME))
+            found[name] = (inode, (stat.st_mtime_ns, stat.st_size))
+        except (FileNotFoundError, NotADirectoryError):
+            found[name] = (inode, None)
+    return found
+
+
+def diff(old: Snapshot, new: Snapshot) -> list[dict[str, Any]]:
+    """Turn two snapshots into created/modified/renamed/deleted events"""
+    events = []
+    gone = {inode: name for name, (inode, _) in old.items() if name not in new}
+    for name in sorted(new.keys() - old.keys()):
+        # A renamed directory keeps its inode
+        source = gone.pop(new[name][0], None)
+        if source is None:
+            events.append({"type": "created", "name": name})
+        else:
+            events.append({"type": "renamed", "name": name, "from": source})
+    events.extend({"type": "deleted", "name": name} for name in sorted(gone.values()))
+    events.extend(
+        {"type": "modified", "name": name}
+        for name in sorted(new.keys() & old.keys())
+        if new[name] != old[name]
+    )
+    return events
+
+
+def _inotify():
+    """Return libc if it provides inotify, else None"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        libc.inotify_init1  # pylint: disable=pointless-statement
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class ProfileWatcher:
+    """Watch PROFILE_DIR with inotify (or by polling) and report debounced profile events.
+
+    on_events is called from the watcher thread with every event that
+    happened since the last quiet period of debounce seconds."""
+
+    def __init__(
+        self,
+        on_events: Callable[[list[dict[str, Any]]], None],
+        root: Path = PROFILE_DIR,
+        debounce: float = 0.2,
+        interval: float = 1.0,
+        polling: bool = False,
+    ) -> None:
+        self._on_events = on_events
+        self._root = root
+        self._debounce = debounce
+        self._interval = interval
+        self._libc = None if polling else _inotify()
+        self._known: Snapshot = {}
+        self._stop = Event()
+        self._thread: Thread | None = None
+
+    @property
+    def backend(self):
+        """inotify or polling"""
+        return "polling" if self._libc is None else "inotify"
+
+    def start(self):
+        """Start watching in a daemon thread"""
+        ensure_dirs()
+        self._known = scan(self._root)
+        self._thread = Thread(target=self._run, name="profile-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop watching"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _report(self, names=None):
+        """Rescan names (every profile if None) and report what changed"""
+        if names is None:
+            new = scan(self._root)
+            old, self._known = self._known, new
+        else:
+            new = scan(self._root, names)
+            old = {name: self._known.pop(name) for name in names if name in self._known}
+            self._known.update(new)
+        events = diff(old, new)
+        if events:
+            try:
+                self._on_events(events)
+            except Exception:  # pylint: disable=broad-exception-caught
+                logging.exception("Profile event handler failed")
+
+    def _run(self):
+        if self._libc is not None:
+            try:
+                self._run_inotify()
+                return
+            except OSError:
+                logging.exception("inotify failed, polling %s instead", self._root)
+        while not self._stop.wait(self._interval):
+            self._report()
+
+    def _add_watch(self, fd: int, path: str, mask: int) -> int:
+        wd = self._libc.inotify_add_watch(fd, os.fsencode(path), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        return wd
+
+    def _watch_profile(self, fd: int, profiles: dict[int, str], name: str):
+        try:
+            wd = self._add_watch(fd, os.path.join(self._root, name), PROFILE_MASK)
+        except OSError:
+            # Gone already, the rescan will tell
+            return
+        profiles[wd] = name
+
+    def _run_inotify(self):
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        try:
+            self._watch_loop(fd)
+        finally:
+            os.close(fd)
+
+    def _watch_loop(self, fd: int):
+        root = os.fspath(self._root)
+        root_wd = self._add_watch(fd, root, ROOT_MASK)
+        # Watch descriptor -> profile name. Renaming a watched directory keeps
+        # its descriptor, and watching it again under the new name returns it.
+        profiles: dict[int, str] = {}
+        for name in self._known:
+            self._watch_profile(fd, profiles, name)
+        dirty: set[str] = set()
+        overflow = False
+        first = deadline = None
+        while not self._stop.is_set():
+            timeout = 0.5 if deadline is None else max(deadline - time.monotonic(), 0)
+            ready, _, _ = select.select([fd], [], [], min(timeout, 0.5))
+            if ready:
+                data = os.read(fd, 65536)
+                offset = 0
+                while offset < len(data):
+                    wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                    offset += INOTIFY_EVENT.size
+                    name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+                    offset += length
+                    if mask & IN_Q_OVERFLOW:
+                        overflow = True
+                    elif mask & IN_IGNORED:
+                        profiles.pop(wd, None)
+                    elif wd == root_wd and mask & IN_ISDIR:
+                        dirty.add(name)
+                        if mask & (IN_CREATE | IN_MOVED_TO):
+                            self._watch_profile(fd, profiles, name)
+                    elif wd in profiles and name == CONFIG_NAME:
+                        dirty.add(profiles[wd])
+                now = time.monotonic()
+                first = first or now
+                # Wait for a quiet period, but not forever under a steady stream of changes
+                deadline = min(now + self._debounce, first + 5 * self._debounce)
+            elif deadline is not None and time.monotonic() >= deadline:
+                if overflow:
+                    self._report()
+                else:
+                    self._report(dirty)
+                dirty = set()
+                overflow = False
+                first = deadline = None
+
+
+def sync_profiles(events: list[dict[str, Any]]):
+    """Keep the catalog and search index in line with profile events, then push them to the UI"""
+    for event in events:
+        if event["type"] in ("deleted", "renamed"):
+            old = event.get("from", event["name"])
+            CATALOG.invalidate(old)
+            INDEX.remove(old)
+        if event["type"] != "deleted":
+            CATALOG.invalidate(event["name"])
+            try:
+                INDEX.update(event["name"])
+                event["profile"] = CATALOG.summary(event["name"])
+            except (ConfigError, TypeError, ValueError) as error:
+                # e.g. renamed by hand, its sections still carry the old name
+                logging.warning("Can't read profile %s: %s", event["name"], error)
+                event["profile"] = None
+    logging.debug("Profile events -> %d", len(events))
+    EVENTS.emit("profiles-changed", events)
@@ -3,14 +3,26 @@
 import logging
 from os import remove
 from pathlib import Path
-from shutil import copytree, rmtree
-from subprocess import Popen, DEVNULL, STDOUT
+from shutil import rmtree
 from atexit import register
 
 from .error import SecurityError
-from ..profiles import PROFILE_DIR, CWConfig, Profile, SELF, StartConfig, WebviewSetting
-
-PROCESSES: list[Popen] = []
+from .supervisor import SUPERVISOR
+from .traces import TRACES
+from .jobs import JOBS, STAGING_DIR, Job, copy_tree, delete_directory, work_dir
+from ..catalog import CATALOG
+from ..search import INDEX
+from ..storage import SCANNER, PrunePolicy, parse_size, prune
+from ..profiles import (
+    PROFILE_DIR,
+    CWConfig,
+    Limits,
+    Profile,
+    StartConfig,
+    WebviewSetting,
+    batch_saves,
+    validate_profiles,
+)
 
 # pylint: disable=protected-access
 DEFAULT_PROFILE = Profile("", "", None)
@@ -74,8 +86,16 @@ def check_paths(paths):
 @register
 def unloading():
     """Unloading"""
-    for process in PROCESSES:
-        process.wait(2)
+    SUPERVISOR.shutdown(2)
+
+
+def _delete_profile(job: Job, name: str):
+    delete_directory(job, PROFILE_DIR / name)
+    INDEX.remove(name)
+
+
+def _prune(job: Job, policy: PrunePolicy, names, dry_run: bool):
+    return prune(policy, names, dry_run, job)
 
 
 class WebviewAPI:
@@ -84,46 +104,80 @@ class WebviewAPI:
     def profile_list(self):
         """Profile list"""
         logging.debug("profile list")
-        profiles = (
-            {"name": path.name, "path": str(path), **Profile.load_return(path.name)}
-            for path in (a for a in PROFILE_DIR.iterdir() if a.is_dir())
-        )
-        return tuple(profiles)
+        return tuple(CATALOG.profiles())
+
+    def list_profiles(
+        self,
+        offset: int = 0,
+        limit: int = 50,
+        sort: str = "name",
+        fields: list[str] | None = None,
+        reverse: bool = False,
+    ):
+        """Paginated profile list, only summary fields unless told otherwise"""
+        logging.debug("list profiles %d+%d by %s", offset, limit, sort)
+        return CATALOG.page(offset, limit, sort, fields, reverse)
+
+    def search(
+        self,
+        query: str | None = None,
+        prefix: bool = False,
+        host: str | None = None,
+        flags: dict[str, bool] | None = None,
+        offset: int = 0,
+        limit: int = 50,
+        fields: list[str] | None = None,
+    ):
+        """Search profiles by name/title, URL host and boolean flags"""
+        logging.debug("search %r host=%r flags=%r", query, host, flags)
+        names = INDEX.search(query, prefix, host, flags)
+        offset = max(offset, 0)
+        window = names[offset : offset + limit] if limit > 0 else names[offset:]
+        return {
+            "total": len(names),
+            "offset": offset,
+            "items": [CATALOG.summary(name, fields) for name in window],
+        }
 
     def fetch_profile(self, name):
         """Fetch profile"""
         logging.debug("fetch profile")
-        profile = {"name": name, "path": str(PROFILE_DIR / name)}
-        profile_data = Profile.load_return(name)
-        profile.update(profile_data)
-        return profile
+        return CATALOG.get(name)
 
-    def execute(self, name):
-        """Execute a profile"""
+    def execute(self, name, shared: bool = False):
+        """Execute a profile, as a window of a shared host if shared"""
         logging.debug("Executing %s", name)
-        # pylint: disable=consider-using-with
-        proc = Popen(
-            ["python", SELF, "run", name],
-            start_new_session=True,
-            stdout=DEVNULL,
-            stderr=STDOUT,
-        )
-        PROCESSES.append(proc)
+        SUPERVISOR.spawn(name, False, shared)
         return True
 
-    def pexec(self, name):
+    def pexec(self, name, shared: bool = False):
         """Execute a profile"""
         logging.debug("Executing %s", name)
-        # pylint: disable=consider-using-with
-        proc = Popen(
-            ["python", SELF, "run", name, "--private"],
-            start_new_session=True,
-            stdout=DEVNULL,
-            stderr=STDOUT,
-        )
-        PROCESSES.append(proc)
+        SUPERVISOR.spawn(name, True, shared)
         return True
 
+    def running_apps(self):
+        """Return pid, uptime, RSS and CPU time of every running profile"""
+        return SUPERVISOR.running_apps()
+
+    def stop_app(self, name: str):
+        """Stop every running instance of a profile, return how many there were"""
+        check_path(name)
+        return SUPERVISOR.stop(name)
+
+    def restart_app(self, name: str):
+        """Restart every running instance of a profile, return their new pids"""
+        check_path(name)
+        return SUPERVISOR.restart(name)
+
+    def launch_report(self, names: list[str] | None = None):
+        """Launch count, errors and latency distributions of profiles, by phase"""
+        return TRACES.history.report(names)
+
+    def launch_history(self, name: str, limit: int = 50):
+        """Latest launch traces of a profile, newest first"""
+        return TRACES.history.history(name, limit)
+
     def new_profile(self, profile_data):
         """New profile"""
         return self.patch_profile(profile_data)
@@ -135,11 +189,49 @@ class WebviewAPI:
         profile._data = CWConfig(**profile_data["app"])
         profile._start_data = StartConfig(**profile_data["start"])
         profile.common_config = WebviewSetting(**profile_data["config"])
+        profile.limits = Limits(**profile_data.get("limits", {}))
         if (x := profile.validate()):
             return x
         profile.save()
+        INDEX.update(profile._name)
         return []
 
+    def patch_profile_delta(self, name: str, changes: dict):
+        """Patch only the given fields of a profile, e.g. {"app": {"on_top": True}}.
+
+        A null value resets the field to its default."""
+        check_path(name)
+        profile = Profile.load(name)
+        if not profile._config.exists():  # pylint: disable=protected-access
+            return [{"condition": False, "of": "name", "message": "Profile does not exist"}]
+        errors = profile.patch(changes)
+        if not errors:
+            INDEX.update(name)
+        return errors
+
+    def patch_profiles(self, profiles_data: list):
+        """Patch several profiles, writing them out together.
+
+        Returns validation errors by profile name; invalid profiles are skipped."""
+        # pylint: disable=protected-access
+        errors = {}
+        saved = []
+        with batch_saves():
+            for profile_data in profiles_data:
+                profile = Profile(profile_data["name"], None)
+                profile._data = CWConfig(**profile_data["app"])
+                profile._start_data = StartConfig(**profile_data["start"])
+                profile.common_config = WebviewSetting(**profile_data["config"])
+                profile.limits = Limits(**profile_data.get("limits", {}))
+                if (x := profile.validate()):
+                    errors[profile._name] = x
+                    continue
+                profile.save()
+                saved.append(profile._name)
+        for name in saved:
+            INDEX.update(name)
+        return errors
+
     def rename(self, name: str, to: str):
         """Rename a profile"""
         # pylint: disable=protected-access
@@ -150,7 +242,10 @@ class WebviewAPI:
         profile_dir = profile_dir.replace(PROFILE_DIR / to)
         _ =  [remove(a) for a in profile_dir.glob(f"{name}.*")]
         data._name = to
-        data.save()
+        with batch_saves():
+            data.save()
+        INDEX.remove(name)
+        INDEX.update(to)
 
     def shallow_copy(self, name: str, to: str, ignore_exists: bool = False):
         """Shallow copy a profile"""
@@ -163,25 +258,89 @@ class WebviewAPI:
         new_profile._data = profile.data
         new_profile._start_data = profile.start_data
         new_profile.common_config = profile.common_config
-        new_profile.save()
+        new_profile.limits = profile.limits
+        with batch_saves():
+            new_profile.save()
+        INDEX.update(to)
         return "ok"
 
-    def deep_copy(self, name: str, to: str):
-        """Deep copy a profile"""
+    def deep_copy(self, name: str, to: str, skip_cache: bool = False):
+        """Deep copy a profile in the background, return {"job": job id} or an error.
+
+        Data is shared with the source where the filesystem allows it; with
+        skip_cache, browser caches aren't copied at all."""
         check_paths((name, to))
-        profile: Path = PROFILE_DIR / name
         new_profile: Path = PROFILE_DIR / to
         if new_profile.exists():
             return "Destination/new profile must not be an active profile"
-        copytree(profile, new_profile)
-        self.shallow_copy(name, to, True)
-        return "ok"
+        if not (PROFILE_DIR / name).is_dir():
+            return "Source profile does not exist"
+        return {"job": JOBS.submit("deep_copy", to, self._deep_copy, name, to, skip_cache)}
+
+    def _deep_copy(self, job: Job, name: str, to: str, skip_cache: bool):
+        # Copied aside first, so the profile only shows up once complete
+        staging = work_dir(STAGING_DIR)
+        try:
+            stats = copy_tree(job, PROFILE_DIR / name, staging / to, skip_cache)
+            job.commit()
+            if (PROFILE_DIR / to).exists():
+                raise FileExistsError(f"{to} was created meanwhile")
+            (staging / to).rename(PROFILE_DIR / to)
+            self.shallow_copy(name, to, True)
+            logging.debug("Deep copy %s -> %s: %s", name, to, stats)
+            return stats
+        finally:
+            rmtree(staging, ignore_errors=True)
 
     def delete_profile(self, name: str):
-        """Delete a profile"""
+        """Delete a profile in the background, return {"job": job id}"""
         check_path(name)
-        profile: Path = PROFILE_DIR / name
-        rmtree(profile)
+        return {"job": JOBS.submit("delete", name, _delete_profile, name)}
+
+    def storage_usage(self, names: list[str] | None = None, fresh: bool = False):
+        """Return bytes, cache bytes and file count of profiles, by name"""
+        if names is not None:
+            check_paths(names)
+        return SCANNER.usage(names, fresh)
+
+    def prune_storage(
+        self,
+        max_size: int | str | None = None,
+        max_age_days: float | None = None,
+        budget: int | str | None = None,
+        names: list[str] | None = None,
+        dry_run: bool = False,
+    ):
+        """Trim browser caches in the background until the limits hold, return {"job": job id}.
+
+        The job result tells how much was (or, on dry runs, would be) freed,
+        and which profiles were skipped for storing data outside PROFILE_DIR."""
+        if names is not None:
+            check_paths(names)
+        policy = PrunePolicy(
+            None if max_size is None else parse_size(max_size),
+            None if max_age_days is None else max_age_days * 86400,
+            None if budget is None else parse_size(budget),
+        )
+        return {"job": JOBS.submit("prune", "storage", _prune, policy, names, dry_run)}
+
+    def job_status(self, job_id: str):
+        """Return the status of a job, None if unknown"""
+        try:
+            return JOBS.get(job_id).status()
+        except KeyError:
+            return None
+
+    def job_list(self):
+        """Return the status of every recent job"""
+        return JOBS.jobs()
+
+    def cancel_job(self, job_id: str):
+        """Cancel a job, return whether it could be"""
+        try:
+            return JOBS.get(job_id).cancel()
+        except KeyError:
+            return False
 
     def validate_profile(self, profile_data):
         """Validate profile data"""
@@ -190,7 +349,15 @@ class WebviewAPI:
         profile._data = CWConfig(**profile_data["app"])
         profile._start_data = StartConfig(**profile_data["start"])
         profile.common_config = WebviewSetting(**profile_data["config"])
-        return profile.validate()
+        profile.limits = Limits(**profile_data.get("limits", {}))
+        # Called on every edit, fields unchanged since the last call aren't checked again
+        return profile.validate(key=id(self))
+
+    def validate_profiles(self, names: list[str] | None = None):
+        """Validate every profile on disk (or only names), return the failures by profile name"""
+        if names is not None:
+            check_paths(names)
+        return validate_profiles(names)
 
     def provide_default(self):
         """Provide default values"""